@@ -1,68 +1,168 @@
 import json
+import queue
+import hashlib
 import threading
+import time
 import os
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, render_template, jsonify, request, send_from_directory, stream_with_context
 from pathlib import Path
 # modules for posting logic (renamed files)
 import nexora_suite as tour
 import nexora_by_phoenix_international as visa
 import insta
+import post_store
+import shared_state
+import log_tail
+import image_store
+import publish_outbox
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'images'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-POSTS_DIR = "posts"
-NZ_FILE = os.path.join(POSTS_DIR, "visa_posts.json")
-TOUR_FILE = os.path.join(POSTS_DIR, "tour_posts.json")
-INSTA_FILE = os.path.join(POSTS_DIR, "insta_posts.json")
-
-# Global state for running tasks
-posting_state = {
-    'tour_running': False,
-    'nz_running': False,
-    'insta_running': False,
-    'threads': {},
-    'tour_status': '',
-    'nz_status': '',
-    'insta_status': '',
-    'tour_current_post': None,
-    'nz_current_post': None,
-    'insta_current_post': None,
-    'tour_interval': 30 * 60,  # 30 minutes in seconds
-    'nz_interval': 30 * 60,
-    'insta_interval': 3 * 60  # 3 minutes for Instagram sync
+# post libraries served by the API (stored in post_store)
+POST_TYPES = ('tour', 'nz', 'insta')
+POST_FIELDS = ('id', 'message', 'image_filename')
+MAX_PAGE_SIZE = 500
+
+class BulkImportError(ValueError):
+    """A rejected line in an NDJSON post import."""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+# posting task name -> (module, run loop, stop function); runtime state for
+# these lives in shared_state so every gunicorn worker sees the same thing
+TASK_MODULES = {
+    'tour': (tour, tour.run_nexora_suite, tour.stop_nexora_suite),
+    'nz': (visa, visa.run_nexora_by_phoenix, visa.stop_nexora_by_phoenix),
+    'insta': (insta, insta.run_insta_sync, insta.stop_insta_sync),
 }
-
-def load_posts(filepath):
-    """Load posts from JSON file"""
-    try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    except:
-        return []
-
-def save_posts(filepath, posts):
-    """Save posts to JSON file"""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w') as f:
-        json.dump(posts, f, indent=2)
+# status callback keys the posting modules use for themselves
+STATUS_ALIASES = {'nexora_suite': 'tour', 'nexora_by_phoenix': 'nz'}
+SUPERVISOR_POLL = 5  # seconds
+# how long a start waits for this worker's previous loop of the task to exit
+STOP_JOIN_TIMEOUT = 10  # seconds
+
+GRAHAK_STATUS_FILE = os.path.join('config', 'automation_status.json')
+GRAHAK_STATUS_DEFAULT = {
+    "news_enabled": True,
+    "youtube_enabled": True,
+    "last_news_run": "",
+    "last_youtube_run": "",
+    "last_news_post": "",
+    "last_youtube_post": ""
+}
+# log files followed by /api/stream and /api/grahak/logs
+LOG_FILES = {'news': 'news.log', 'youtube': 'yt.log'}
+LOG_TAIL_LINES = 50
+
+# /api/stream: how often to check for changes, comment-ping interval and
+# the reconnect delay suggested to the browser
+STREAM_POLL = 1.0
+STREAM_KEEPALIVE = 15.0
+STREAM_RETRY_MS = 3000
+# each open stream holds a request thread; past this many per worker new
+# ones get a 503 (the dashboard then polls /api/status) so the API keeps threads
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', '8'))
+# messages buffered for a slow client before it is dropped (it reconnects)
+STREAM_QUEUE_SIZE = 100
+
+# Cache-Control max-age for content-hashed images (one year)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# posting threads owned by this worker process
+_local_threads = {}
+_supervisor_lock = threading.Lock()
+# serializes task starts with the supervisor's view of _local_threads
+_tasks_lock = threading.Lock()
+_supervisor_started = False
+
+# /api/stream clients in this worker (one queue each), fed by one poller thread
+_streams = set()
+_streams_lock = threading.Lock()
+_stream_poller = None
 
 def update_posting_status(post_type, is_running, message='', current_post=None):
     """Update posting status for a specific post type"""
-    if post_type == 'tour':
-        posting_state['tour_running'] = is_running
-        posting_state['tour_status'] = message
-        posting_state['tour_current_post'] = current_post
-    elif post_type == 'nz':
-        posting_state['nz_running'] = is_running
-        posting_state['nz_status'] = message
-        posting_state['nz_current_post'] = current_post
-    elif post_type == 'insta':
-        posting_state['insta_running'] = is_running
-        posting_state['insta_status'] = message
-        posting_state['insta_current_post'] = current_post
+    post_type = STATUS_ALIASES.get(post_type, post_type)
+    if post_type in shared_state.TASKS:
+        shared_state.update_status(post_type, is_running, message, current_post)
+
+def _supervise():
+    """Heartbeat our tasks, apply stops/interval changes made via other workers
+    and stop tasks whose owning worker died."""
+    while True:
+        time.sleep(SUPERVISOR_POLL)
+        try:
+            owned = list(_local_threads)
+            shared_state.heartbeat(owned)
+            shared_state.release_stale()
+            if not owned:
+                continue
+            with _tasks_lock:
+                rows = shared_state.get_all()
+                for name in owned:
+                    row = rows[name]
+                    module, _, stop = TASK_MODULES[name]
+                    thread = _local_threads.get(name)
+                    if not row['running'] or row['owner_pid'] != os.getpid():
+                        _local_threads.pop(name, None)
+                        stop()
+                    elif thread is None or not thread.is_alive():
+                        _local_threads.pop(name, None)
+                        shared_state.release(name)
+                    elif module.current_interval != row['interval']:
+                        module.set_interval(row['interval'])
+        except Exception as e:
+            print("Error in state supervisor:", e)
+
+def _ensure_supervisor():
+    global _supervisor_started
+    with _supervisor_lock:
+        if not _supervisor_started:
+            threading.Thread(target=_supervise, daemon=True).start()
+            _supervisor_started = True
+
+def _start_task(post_type):
+    """Claim a task in shared state and run its loop in this worker."""
+    with _tasks_lock:
+        if not shared_state.claim(post_type):
+            return False
+        module, run, stop = TASK_MODULES[post_type]
+        previous = _local_threads.pop(post_type, None)
+        if previous is not None and previous.is_alive():
+            # stopped via another worker, but our supervisor hasn't stopped the
+            # loop yet: clearing stop_event now would leave two loops running
+            stop()
+            previous.join(STOP_JOIN_TIMEOUT)
+            if previous.is_alive():
+                _local_threads[post_type] = previous
+                shared_state.release(post_type)
+                return False
+        module.set_status_callback(update_posting_status)
+        module.set_interval(shared_state.get(post_type)['interval'])
+        module.stop_event.clear()
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        _local_threads[post_type] = thread
+    _ensure_supervisor()
+    return True
+
+def _stop_task(post_type):
+    """Release a task; the owning worker's supervisor stops its loop."""
+    if not shared_state.release(post_type):
+        return False
+    if _local_threads.pop(post_type, None) is not None:
+        TASK_MODULES[post_type][2]()
+    return True
+
+def _is_running(row):
+    """Running and owned by a live worker (heartbeat not stale)."""
+    return bool(row['running']) and time.time() - row['heartbeat'] < shared_state.HEARTBEAT_TIMEOUT
 
 @app.route('/')
 def index():
@@ -72,90 +172,145 @@ def index():
 # Posts API endpoints
 @app.route('/api/posts/<post_type>', methods=['GET'])
 def get_posts(post_type):
-    """Get posts for a specific type"""
-    if post_type == 'tour':
-        posts = load_posts(TOUR_FILE)
-    elif post_type == 'nz':
-        posts = load_posts(NZ_FILE)
-    elif post_type == 'insta':
-        posts = load_posts(INSTA_FILE)
-    else:
+    """Get posts for a specific type.
+
+    Query params: limit, cursor (id of the last post seen), q (message
+    filter) and fields (comma-separated projection). The next page's cursor
+    is returned in the X-Next-Cursor header. Responses carry an ETag tied to
+    the library version, so unchanged reloads get a 304.
+    """
+    if post_type not in POST_TYPES:
         return jsonify({'error': 'Invalid post type'}), 400
     
-    return jsonify(posts)
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', 0, type=int)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    q = request.args.get('q', '').strip() or None
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    if any(f not in POST_FIELDS for f in fields):
+        return jsonify({'error': 'Invalid fields'}), 400
+    
+    version = post_store.get_version(post_type)
+    query = hashlib.md5(request.query_string).hexdigest()[:12]
+    etag = f"{post_type}-{version}-{query}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    posts, next_cursor = post_store.query_posts(post_type, after=cursor, limit=limit, q=q)
+    if fields:
+        posts = [{f: p[f] for f in fields} for p in posts]
+    
+    response = jsonify(posts)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
 
 @app.route('/api/posts/<post_type>', methods=['POST'])
 def add_post(post_type):
     """Add a new post"""
-    if post_type == 'tour':
-        filepath = TOUR_FILE
-    elif post_type == 'nz':
-        filepath = NZ_FILE
-    elif post_type == 'insta':
-        filepath = INSTA_FILE
-    else:
+    if post_type not in POST_TYPES:
         return jsonify({'error': 'Invalid post type'}), 400
     
     data = request.get_json()
-    posts = load_posts(filepath)
-    
-    new_post = {
-        'message': data.get('message', ''),
-        'image_filename': data.get('image_filename', '')
-    }
-    posts.append(new_post)
-    save_posts(filepath, posts)
+    new_post = post_store.add_post(
+        post_type,
+        message=data.get('message', ''),
+        image_filename=data.get('image_filename', '')
+    )
     
     return jsonify(new_post), 201
 
-@app.route('/api/posts/<post_type>/<int:index>', methods=['PUT'])
-def update_post(post_type, index):
-    """Update a post"""
-    if post_type == 'tour':
-        filepath = TOUR_FILE
-    elif post_type == 'nz':
-        filepath = NZ_FILE
-    elif post_type == 'insta':
-        filepath = INSTA_FILE
-    else:
+@app.route('/api/posts/<post_type>/<int:post_id>', methods=['PUT'])
+def update_post(post_type, post_id):
+    """Update a post by its stable id"""
+    if post_type not in POST_TYPES:
         return jsonify({'error': 'Invalid post type'}), 400
     
-    posts = load_posts(filepath)
-    if index < 0 or index >= len(posts):
-        return jsonify({'error': 'Post not found'}), 404
-    
     data = request.get_json()
-    posts[index]['message'] = data.get('message', posts[index].get('message', ''))
-    posts[index]['image_filename'] = data.get('image_filename', posts[index].get('image_filename', ''))
+    post = post_store.update_post(
+        post_type, post_id,
+        message=data.get('message'),
+        image_filename=data.get('image_filename')
+    )
+    if post is None:
+        return jsonify({'error': 'Post not found'}), 404
     
-    save_posts(filepath, posts)
-    return jsonify(posts[index])
-
-@app.route('/api/posts/<post_type>/<int:index>', methods=['DELETE'])
-def delete_post(post_type, index):
-    """Delete a post"""
-    if post_type == 'tour':
-        filepath = TOUR_FILE
-    elif post_type == 'nz':
-        filepath = NZ_FILE
-    elif post_type == 'insta':
-        filepath = INSTA_FILE
-    else:
+    return jsonify(post)
+
+@app.route('/api/posts/<post_type>/<int:post_id>', methods=['DELETE'])
+def delete_post(post_type, post_id):
+    """Delete a post by its stable id"""
+    if post_type not in POST_TYPES:
         return jsonify({'error': 'Invalid post type'}), 400
     
-    posts = load_posts(filepath)
-    if index < 0 or index >= len(posts):
+    if not post_store.delete_post(post_type, post_id):
         return jsonify({'error': 'Post not found'}), 404
     
-    posts.pop(index)
-    save_posts(filepath, posts)
-    
     return jsonify({'success': True})
 
+@app.route('/api/posts/<post_type>/export', methods=['GET'])
+def export_posts(post_type):
+    """Stream a post library as NDJSON (one post object per line)"""
+    if post_type not in POST_TYPES:
+        return jsonify({'error': 'Invalid post type'}), 400
+    
+    def generate():
+        for post in post_store.iter_posts(post_type):
+            yield json.dumps(post) + '\n'
+    
+    response = app.response_class(generate(), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename={post_type}_posts.ndjson'
+    return response
+
+@app.route('/api/posts/<post_type>/import', methods=['POST'])
+def import_posts(post_type):
+    """Bulk-load NDJSON posts in a single transaction (?replace=1 empties the library first).
+
+    Each line is {"message": ..., "image_filename": ...}; a referenced image
+    must exist in images/. Any bad line rejects the whole batch.
+    """
+    if post_type not in POST_TYPES:
+        return jsonify({'error': 'Invalid post type'}), 400
+    
+    known_images = set()
+    
+    def parse():
+        for line_no, raw in enumerate(request.stream, start=1):
+            if not raw.strip():
+                continue
+            try:
+                post = json.loads(raw)
+            except ValueError:
+                raise BulkImportError(line_no, 'invalid JSON')
+            if not isinstance(post, dict):
+                raise BulkImportError(line_no, 'expected a JSON object')
+            message = post.get('message', '')
+            image = post.get('image_filename', '') or ''
+            if not isinstance(message, str) or not isinstance(image, str):
+                raise BulkImportError(line_no, 'message and image_filename must be strings')
+            if image and image not in known_images:
+                if os.path.basename(image) != image or not os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], image)):
+                    raise BulkImportError(line_no, f'image not found: {image}')
+                known_images.add(image)
+            yield {'message': message, 'image_filename': image}
+    
+    replace = request.args.get('replace', '').lower() in ('1', 'true', 'yes')
+    try:
+        count = post_store.import_posts(post_type, parse(), replace=replace)
+    except BulkImportError as e:
+        return jsonify({'error': e.message, 'line': e.line}), 400
+    return jsonify({'imported': count}), 201
+
 # Image upload endpoint
 @app.route('/api/upload', methods=['POST'])
 def upload_image():
-    """Upload an image file"""
+    """Upload an image file (stored by content hash, variants derived up front)"""
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
@@ -163,90 +318,52 @@ def upload_image():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    if file:
-        filename = file.filename
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        return jsonify({'filename': filename}), 201
-    
-    return jsonify({'error': 'File upload failed'}), 400
+    try:
+        filename, duplicate = image_store.ingest(file.read())
+    except image_store.InvalidImage as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'filename': filename, 'duplicate': duplicate}), 201
 
 # Control endpoints
 @app.route('/api/control/tour/start', methods=['POST'])
 def start_tour():
     """Start tour posting"""
-    if not posting_state['tour_running']:
-        tour.set_status_callback(update_posting_status)
-        tour.set_interval(posting_state['tour_interval'])
-        tour.stop_event.clear()
-        # module renamed; use updated function name
-        thread = threading.Thread(target=tour.run_nexora_suite, daemon=True)
-        thread.start()
-        posting_state['threads']['tour'] = thread
-        posting_state['tour_running'] = True
-        update_posting_status('tour', True, 'Starting...', None)
+    if _start_task('tour'):
         return jsonify({'status': 'Tour posting started'}), 200
     return jsonify({'status': 'Tour already running'}), 200
 
 @app.route('/api/control/tour/stop', methods=['POST'])
 def stop_tour():
     """Stop tour posting"""
-    if posting_state['tour_running']:
-        tour.stop_nexora_suite()
-        posting_state['tour_running'] = False
-        update_posting_status('tour', False, '', None)
+    if _stop_task('tour'):
         return jsonify({'status': 'Tour posting stopped'}), 200
     return jsonify({'status': 'Tour not running'}), 200
 
 @app.route('/api/control/nz/start', methods=['POST'])
 def start_nz():
     """Start NZ visa posting"""
-    if not posting_state['nz_running']:
-        visa.set_status_callback(update_posting_status)
-        visa.set_interval(posting_state['nz_interval'])
-        visa.stop_event.clear()
-        # module renamed; use updated function name
-        thread = threading.Thread(target=visa.run_nexora_by_phoenix, daemon=True)
-        thread.start()
-        posting_state['threads']['nz'] = thread
-        posting_state['nz_running'] = True
-        update_posting_status('nz', True, 'Starting...', None)
+    if _start_task('nz'):
         return jsonify({'status': 'NZ posting started'}), 200
     return jsonify({'status': 'NZ already running'}), 200
 
 @app.route('/api/control/nz/stop', methods=['POST'])
 def stop_nz():
     """Stop NZ visa posting"""
-    if posting_state['nz_running']:
-        visa.stop_nexora_by_phoenix()
-        posting_state['nz_running'] = False
-        update_posting_status('nz', False, '', None)
+    if _stop_task('nz'):
         return jsonify({'status': 'NZ posting stopped'}), 200
     return jsonify({'status': 'NZ not running'}), 200
 
 @app.route('/api/control/insta/start', methods=['POST'])
 def start_insta():
     """Start Instagram sync"""
-    if not posting_state['insta_running']:
-        insta.set_status_callback(update_posting_status)
-        insta.set_interval(posting_state['insta_interval'])
-        insta.stop_event.clear()
-        thread = threading.Thread(target=insta.run_insta_sync, daemon=True)
-        thread.start()
-        posting_state['threads']['insta'] = thread
-        posting_state['insta_running'] = True
-        update_posting_status('insta', True, 'Starting...', None)
+    if _start_task('insta'):
         return jsonify({'status': 'Instagram sync started'}), 200
     return jsonify({'status': 'Instagram already running'}), 200
 
 @app.route('/api/control/insta/stop', methods=['POST'])
 def stop_insta():
     """Stop Instagram sync"""
-    if posting_state['insta_running']:
-        insta.stop_insta_sync()
-        posting_state['insta_running'] = False
-        update_posting_status('insta', False, '', None)
+    if _stop_task('insta'):
         return jsonify({'status': 'Instagram sync stopped'}), 200
     return jsonify({'status': 'Instagram not running'}), 200
 
@@ -266,23 +383,126 @@ def stop_all():
     stop_insta()
     return jsonify({'status': 'All tasks stopped'}), 200
 
+def _status_payload():
+    status = {}
+    for name, row in shared_state.get_all().items():
+        status[f'{name}_running'] = _is_running(row)
+        status[f'{name}_status'] = row['status']
+        status[f'{name}_current_post'] = row['current_post']
+        status[f'{name}_interval'] = row['interval']
+    return status
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get current status of all posting tasks"""
-    return jsonify({
-        'tour_running': posting_state['tour_running'],
-        'nz_running': posting_state['nz_running'],
-        'insta_running': posting_state['insta_running'],
-        'tour_status': posting_state['tour_status'],
-        'nz_status': posting_state['nz_status'],
-        'insta_status': posting_state['insta_status'],
-        'tour_current_post': posting_state['tour_current_post'],
-        'nz_current_post': posting_state['nz_current_post'],
-        'insta_current_post': posting_state['insta_current_post'],
-        'tour_interval': posting_state['tour_interval'],
-        'nz_interval': posting_state['nz_interval'],
-        'insta_interval': posting_state['insta_interval']
-    })
+    return jsonify(_status_payload())
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _poll_streams():
+    """Check for changes once per STREAM_POLL and fan them out to every stream.
+
+    Runs while this worker has stream clients, so the state DB and log files
+    are read once per poll however many dashboards are open.
+    """
+    global _stream_poller
+    seq = shared_state.last_event_seq()
+    log_offsets = {name: os.path.getsize(path) if os.path.exists(path) else 0
+                   for name, path in LOG_FILES.items()}
+    while True:
+        time.sleep(STREAM_POLL)
+        with _streams_lock:
+            if not _streams:
+                _stream_poller = None
+                return
+        messages = []
+        try:
+            events = shared_state.events_since(seq)
+            kinds = set()
+            grahak = None
+            for seq, kind, data in events:
+                kinds.add(kind)
+                if kind == 'grahak':
+                    grahak = data
+                elif kind == 'stopped':
+                    messages.append(_sse('stopped', data))
+            # coalesce bursts of status updates into one snapshot
+            if kinds & {'status', 'stopped'}:
+                messages.append(_sse('status', _status_payload()))
+            if grahak is not None:
+                messages.append(_sse('grahak', grahak))
+            for name, path in LOG_FILES.items():
+                lines, log_offsets[name] = log_tail.read_since(path, log_offsets[name])
+                if lines:
+                    messages.append(_sse('log', {'source': name, 'lines': lines}))
+        except Exception as e:
+            print("Error in stream poller:", e)
+        if not messages:
+            continue
+        with _streams_lock:
+            for q in list(_streams):
+                try:
+                    for message in messages:
+                        q.put_nowait(message)
+                except queue.Full:
+                    # too far behind; its generator ends and the browser reconnects
+                    _streams.discard(q)
+
+def _subscribe():
+    """Register a stream client -> its message queue, or None when at STREAM_MAX_CLIENTS."""
+    global _stream_poller
+    with _streams_lock:
+        if len(_streams) >= STREAM_MAX_CLIENTS:
+            return None
+        q = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        _streams.add(q)
+        if _stream_poller is None:
+            _stream_poller = threading.Thread(target=_poll_streams, daemon=True)
+            _stream_poller.start()
+    return q
+
+def _unsubscribe(q):
+    with _streams_lock:
+        _streams.discard(q)
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events: 'status', 'grahak', 'log' and 'stopped' messages.
+
+    Sends a snapshot on connect, then only what changed. Changes from any
+    worker or Grahak script arrive through the shared_state event table;
+    'stopped' names a task whose worker died.
+    """
+    q = _subscribe()
+    if q is None:
+        response = jsonify({'error': 'Too many open streams, poll /api/status instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_MS // 1000)
+        return response
+    # the supervisor is what notices a dead worker's tasks
+    _ensure_supervisor()
+
+    def generate():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            yield _sse('status', _status_payload())
+            yield _sse('grahak', _read_config(GRAHAK_STATUS_FILE, dict(GRAHAK_STATUS_DEFAULT)))
+            while True:
+                try:
+                    yield q.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    with _streams_lock:
+                        if q not in _streams:
+                            return
+                    yield ": keepalive\n\n"
+        finally:
+            _unsubscribe(q)
+
+    response = app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 # --- GrahakChetna endpoints ---
@@ -297,52 +517,47 @@ def _read_config(path, default):
             json.dump(default, f, indent=2)
         return default
 
+def _save_grahak_status(status):
+    """Write automation status and notify /api/stream followers."""
+    with open(GRAHAK_STATUS_FILE,'w') as f:
+        json.dump(status, f, indent=2)
+    shared_state.publish('grahak', status)
+
 @app.route('/api/grahak/status', methods=['GET'])
 def grahak_status():
-    status = _read_config(os.path.join('config','automation_status.json'), {
-        "news_enabled": True,
-        "youtube_enabled": True,
-        "last_news_run": "",
-        "last_youtube_run": "",
-        "last_news_post": "",
-        "last_youtube_post": ""
-    })
+    status = _read_config(GRAHAK_STATUS_FILE, dict(GRAHAK_STATUS_DEFAULT))
     return jsonify(status)
 
 @app.route('/api/grahak/start_news', methods=['POST'])
 def grahak_start_news():
-    status = _read_config(os.path.join('config','automation_status.json'), {})
+    status = _read_config(GRAHAK_STATUS_FILE, {})
     status['news_enabled'] = True
     status['last_news_run'] = datetime.utcnow().isoformat()
-    with open(os.path.join('config','automation_status.json'),'w') as f:
-        json.dump(status, f, indent=2)
+    _save_grahak_status(status)
     return jsonify({'status':'ok'})
 
 @app.route('/api/grahak/stop_news', methods=['POST'])
 def grahak_stop_news():
-    status = _read_config(os.path.join('config','automation_status.json'), {})
+    status = _read_config(GRAHAK_STATUS_FILE, {})
     status['news_enabled'] = False
-    with open(os.path.join('config','automation_status.json'),'w') as f:
-        json.dump(status, f, indent=2)
+    _save_grahak_status(status)
     return jsonify({'status':'ok'})
 
 @app.route('/api/grahak/run_news', methods=['POST'])
 def grahak_run_news():
     # run script directly
     threading.Thread(target=lambda: os.system('python3 grahak_news_auto.py'), daemon=True).start()
-    status = _read_config(os.path.join('config','automation_status.json'), {})
+    status = _read_config(GRAHAK_STATUS_FILE, {})
     status['last_news_run'] = datetime.utcnow().isoformat()
-    with open(os.path.join('config','automation_status.json'),'w') as f:
-        json.dump(status, f, indent=2)
+    _save_grahak_status(status)
     return jsonify({'status':'started'})
 
 @app.route('/api/grahak/run_youtube', methods=['POST'])
 def grahak_run_youtube():
     threading.Thread(target=lambda: os.system('python3 grahak_youtube_auto.py'), daemon=True).start()
-    status = _read_config(os.path.join('config','automation_status.json'), {})
+    status = _read_config(GRAHAK_STATUS_FILE, {})
     status['last_youtube_run'] = datetime.utcnow().isoformat()
-    with open(os.path.join('config','automation_status.json'),'w') as f:
-        json.dump(status, f, indent=2)
+    _save_grahak_status(status)
     return jsonify({'status':'started'})
 
 @app.route('/api/grahak/feeds', methods=['GET'])
@@ -381,18 +596,41 @@ def grahak_delete_feed():
 
 @app.route('/api/grahak/logs', methods=['GET'])
 def grahak_logs():
-    def tail(path, n=50):
-        try:
-            with open(path,'r') as f:
-                lines=f.readlines()
-            return lines[-n:]
-        except:
-            return []
+    """Last 50 lines of each log, or only lines after ?news_offset= / ?youtube_offset=.
+
+    'offsets' in the response is the cursor to pass on the next call.
+    """
+    logs = {}
+    offsets = {}
+    for name, path in LOG_FILES.items():
+        since = request.args.get(f'{name}_offset', type=int)
+        if since is not None and since < 0:
+            return jsonify({'error': f'invalid {name}_offset'}), 400
+        if since is None:
+            lines, offsets[name] = log_tail.tail(path, LOG_TAIL_LINES)
+        else:
+            lines, offsets[name] = log_tail.read_since(path, since, LOG_TAIL_LINES)
+        logs[name] = [l.rstrip() for l in lines]
+    logs['offsets'] = offsets
+    return jsonify(logs)
+
+@app.route('/api/grahak/outbox', methods=['GET'])
+def grahak_outbox():
+    """Publish job counts per state plus the latest jobs (?kind= to filter)."""
+    kind = request.args.get('kind')
+    limit = max(1, min(request.args.get('limit', 50, type=int), MAX_PAGE_SIZE))
     return jsonify({
-        'news': [l.rstrip() for l in tail('news.log')],
-        'youtube': [l.rstrip() for l in tail('yt.log')]
+        'stats': publish_outbox.stats(kind),
+        'jobs': publish_outbox.recent(kind, limit),
     })
 
+@app.route('/api/grahak/outbox/<int:job_id>/retry', methods=['POST'])
+def grahak_outbox_retry(job_id):
+    """Retry a failed publish job from the stage it failed at."""
+    if not publish_outbox.requeue(job_id):
+        return jsonify({'error': 'no failed job with that id'}), 400
+    return jsonify({'status': 'requeued'})
+
 @app.route('/grahak-dashboard')
 def grahak_dashboard():
     return render_template('index.html')
@@ -401,16 +639,15 @@ def grahak_dashboard():
 @app.route('/api/interval/<post_type>', methods=['GET'])
 def get_interval(post_type):
     """Get posting interval for a specific post type"""
-    interval_key = f'{post_type}_interval'
-    if interval_key not in posting_state:
+    row = shared_state.get(post_type)
+    if row is None:
         return jsonify({'error': 'Invalid post type'}), 400
-    return jsonify({'interval': posting_state[interval_key]})
+    return jsonify({'interval': row['interval']})
 
 @app.route('/api/interval/<post_type>', methods=['PUT'])
 def set_interval(post_type):
     """Set posting interval for a specific post type"""
-    interval_key = f'{post_type}_interval'
-    if interval_key not in posting_state:
+    if post_type not in shared_state.TASKS:
         return jsonify({'error': 'Invalid post type'}), 400
     
     data = request.get_json()
@@ -419,23 +656,53 @@ def set_interval(post_type):
     if not interval or interval <= 0:
         return jsonify({'error': 'Invalid interval value'}), 400
     
-    posting_state[interval_key] = interval
+    shared_state.set_interval(post_type, interval)
     
-    # Update the module if it's running
-    if post_type == 'tour':
-        tour.set_interval(interval)
-    elif post_type == 'nz':
-        visa.set_interval(interval)
-    elif post_type == 'insta':
-        insta.set_interval(interval)
+    # Update the module now if this worker runs it; other workers pick the
+    # change up from shared state on their next supervisor pass
+    if post_type in _local_threads:
+        TASK_MODULES[post_type][0].set_interval(interval)
     
     return jsonify({'success': True, 'interval': interval})
 
 # Serve images
 @app.route('/images/<filename>')
 def serve_image(filename):
-    """Serve image files"""
-    return send_from_directory('images', filename)
+    """Serve image files with validators, range support and ?w= variants.
+
+    ?w=<width> serves a resized JPEG (snapped to image_store.VARIANT_WIDTHS),
+    rendered on first request and cached to disk. Content-hashed names never
+    change, so they get a long-lived immutable cache policy and their hash as
+    the ETag; other names are revalidated on every use. Signed URLs
+    (image_store.signed_url, ?exp=&sig=) are checked and 403 once expired;
+    with IMAGE_URL_SECRET set, the original and the upload-width variant (the
+    forms handed to Graph) are only served signed.
+    """
+    directory, name = image_store.IMAGE_FOLDER, filename
+    width = request.args.get('w', type=int)
+    sig = request.args.get('sig')
+    if sig is not None or image_store.requires_signature(width):
+        # signed URL handed to Graph: must match and not have expired
+        expires = request.args.get('exp', 0, type=int)
+        if not image_store.verify_signature(filename, width or 0, expires, sig or ''):
+            return jsonify({'error': 'invalid or expired signature'}), 403
+    if width and width > 0:
+        width = image_store.snap_width(width)
+        path = image_store.variant_path(filename, width)
+        if path:
+            directory, name = image_store.VARIANT_FOLDER, os.path.basename(path)
+        else:
+            width = None
+    
+    if image_store.is_content_addressed(filename):
+        stem = os.path.splitext(filename)[0]
+        etag = f"{stem}-w{width}" if directory != image_store.IMAGE_FOLDER else stem
+        response = send_from_directory(directory, name, etag=etag, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.immutable = True
+    else:
+        response = send_from_directory(directory, name, max_age=0)
+        response.cache_control.no_cache = True
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
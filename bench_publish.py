@@ -0,0 +1,102 @@
+"""Benchmark the publishing pipeline against a local fake_graph server.
+
+Publishes N items (FB upload + IG publish to every fixture page unless
+--pages is given) through fanout.publish with C items in flight, and
+reports throughput plus p50/p95/p99 per-item latency. No Facebook
+credentials or network access needed.
+
+    python bench_publish.py --items 50 --concurrency 4 --latency 80 --jitter 40
+    python bench_publish.py --items 20 --error-rate 0.05 --governor
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4, help='items published at once')
+    parser.add_argument('--pages', nargs='*', help='page ids (default: every fixture page)')
+    parser.add_argument('--no-instagram', action='store_true')
+    parser.add_argument('--image', default='logo.png', help='image file to publish')
+    parser.add_argument('--latency', type=float, default=50, help='fake Graph mean latency (ms)')
+    parser.add_argument('--jitter', type=float, default=25, help='fake Graph latency jitter (ms)')
+    parser.add_argument('--upload-latency', type=float, default=150, help='extra upload latency (ms)')
+    parser.add_argument('--container-ready', type=float, default=800, help='ms until IG containers finish')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--app-usage', type=int, default=0)
+    parser.add_argument('--governor', action='store_true',
+                        help='keep the configured publish pace (default: unthrottled to measure the pipeline)')
+    args = parser.parse_args()
+
+    # isolate from real tokens/caches before the posting modules are imported
+    scratch = tempfile.mkdtemp(prefix='postpilot-bench-')
+    os.environ['PAGE_DIRECTORY_FILE'] = os.path.join(scratch, 'page_directory.json')
+    os.environ['FB_ACCESS_TOKEN'] = 'BENCH_USER_TOKEN'
+    if not args.governor:
+        os.environ['GRAPH_PUBLISH_PER_MINUTE'] = '1000000'
+        os.environ['GRAPH_PUBLISH_BURST'] = '1000000'
+
+    import fake_graph
+
+    server, base_url = fake_graph.start(
+        latency_ms=args.latency, jitter_ms=args.jitter, upload_latency_ms=args.upload_latency,
+        container_ready_ms=args.container_ready, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, app_usage=args.app_usage,
+    )
+    os.environ['GRAPH_BASE_URL'] = base_url
+
+    import fanout
+    import ig_container
+
+    ig_container.POLL_FIRST = min(ig_container.POLL_FIRST, args.container_ready / 4000 or 0.05)
+    page_ids = args.pages or [p['id'] for p in fake_graph._load_fixtures()['pages']]
+    targets = fanout.targets_for(page_ids, instagram=not args.no_instagram)
+
+    def one(i):
+        start = time.monotonic()
+        results = fanout.publish(args.image, f"bench item {i}", targets)
+        return time.monotonic() - start, sum(not r['ok'] for r in results)
+
+    print(f"{args.items} items x {len(targets)} targets, {args.concurrency} in flight, fake Graph at {base_url}")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(one, range(args.items)))
+    elapsed = time.monotonic() - started
+    server.shutdown()
+
+    latencies = [t for t, _ in outcomes]
+    failures = sum(f for _, f in outcomes)
+    report = {
+        'items': args.items,
+        'targets_per_item': len(targets),
+        'failed_targets': failures,
+        'seconds': round(elapsed, 2),
+        'items_per_minute': round(args.items / elapsed * 60, 1),
+        'p50': round(_percentile(latencies, 50), 3),
+        'p95': round(_percentile(latencies, 95), 3),
+        'p99': round(_percentile(latencies, 99), 3),
+        'max': round(max(latencies, default=0), 3),
+        'graph_calls': fake_graph._stats['calls'],
+    }
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
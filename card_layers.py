@@ -0,0 +1,48 @@
+"""In-memory cache of the static layers of rendered cards.
+
+The Grahak cards share everything but their text: the resized background,
+the red badge, the circular logo and the bottom strip. A renderer builds that
+composite once per (template name, version, asset files) with ``base`` and
+then draws only the variable text on a copy, instead of re-reading and
+LANCZOS-resizing the same images for every card.
+
+Bump the template's version (or edit one of its asset files) to rebuild.
+"""
+
+import os
+import threading
+
+_lock = threading.Lock()
+_layers = {}  # (name, version, asset stamps) -> RGBA image
+
+
+def _stamp(path):
+    try:
+        return path, os.path.getmtime(path)
+    except OSError:
+        return path, None
+
+
+def base(name, version, build, assets=()):
+    """A fresh copy of the cached static layer, building it on first use.
+
+    ``build()`` returns the composited RGBA image; ``assets`` are the files it
+    reads, so replacing one of them rebuilds the layer.
+    """
+    key = (name, version, tuple(_stamp(p) for p in assets if p))
+    layer = _layers.get(key)
+    if layer is None:
+        with _lock:
+            layer = _layers.get(key)
+            if layer is None:
+                layer = build()
+                # drop layers built from older versions/assets of this template
+                for stale in [k for k in _layers if k[0] == name]:
+                    del _layers[stale]
+                _layers[key] = layer
+    return layer.copy()
+
+
+def clear():
+    with _lock:
+        _layers.clear()
@@ -0,0 +1,107 @@
+"""Title layout for the card renderers.
+
+``fit`` breaks a title into lines by measured pixel width and binary-searches
+the largest font size whose lines fit the title box, so a layout costs
+O(log sizes) fitting passes instead of re-measuring every line at every
+size. Measurements go through font_registry and whole layouts are cached by
+(title, box, font), so re-rendering a title is a dictionary lookup.
+
+Usage:
+    layout = card_layout.fit(title, 993, 410, max_size=84, min_size=40)
+    for line, w, h in zip(layout.lines, layout.widths, layout.heights): ...
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import font_registry
+
+ELLIPSIS = "…"
+
+# font is the shared FreeTypeFont for size; total_h includes the gaps between lines
+Layout = namedtuple("Layout", "size font lines widths heights total_h line_gap")
+
+
+def _split_word(word, font, max_width):
+    """Hard-break a word that is wider than the box on its own."""
+    pieces, current = [], ""
+    for ch in word:
+        if current and font_registry.text_size(current + ch, font)[0] >= max_width:
+            pieces.append(current)
+            current = ch
+        else:
+            current += ch
+    return pieces + [current] if current else pieces
+
+
+def break_lines(text, font, max_width):
+    """Greedy word wrap by rendered width (each line narrower than max_width)."""
+    lines, current = [], ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if font_registry.text_size(candidate, font)[0] < max_width:
+            current = candidate
+            continue
+        if current:
+            lines.append(current)
+        if font_registry.text_size(word, font)[0] < max_width:
+            current = word
+        else:
+            *full, current = _split_word(word, font, max_width)
+            lines.extend(full)
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _measure(lines, font, line_gap):
+    widths = tuple(font_registry.text_size(line, font)[0] for line in lines)
+    # one line height for every line, so lines without ascenders don't bunch up
+    heights = (font_registry.line_height(font),) * len(lines)
+    return widths, heights, sum(heights) + line_gap * (len(lines) - 1)
+
+
+def _layout(text, size, box_w, box_h, bold, family, line_gap):
+    font = font_registry.font(size, bold=bold, family=family)
+    lines = tuple(break_lines(text, font, box_w))
+    widths, heights, total_h = _measure(lines, font, line_gap)
+    fits = total_h < box_h and max(widths, default=0) < box_w
+    return fits, Layout(size, font, lines, widths, heights, total_h, line_gap)
+
+
+def _truncate(layout, box_w, box_h):
+    """Drop lines that overflow the box at the smallest size, ending in an ellipsis."""
+    lines = list(layout.lines)
+    while len(lines) > 1 and _measure(lines, layout.font, layout.line_gap)[2] >= box_h:
+        lines.pop()
+    last = lines[-1]
+    while last and font_registry.text_size(last + ELLIPSIS, layout.font)[0] >= box_w:
+        last = last[:-1].rstrip()
+    lines[-1] = last + ELLIPSIS
+    widths, heights, total_h = _measure(lines, layout.font, layout.line_gap)
+    return layout._replace(lines=tuple(lines), widths=widths, heights=heights, total_h=total_h)
+
+
+@lru_cache(maxsize=1024)
+def fit(text, box_w, box_h, max_size=84, min_size=40, bold=True, family=font_registry.DEFAULT_FAMILY,
+        line_gap=14):
+    """Largest-font layout of ``text`` inside a box_w x box_h title box.
+
+    Falls back to min_size, truncating with an ellipsis if even that
+    overflows. Don't mutate the returned Layout's font.
+    """
+    text = " ".join(text.split())
+    best = None
+    lo, hi = min_size, max_size
+    while lo <= hi:
+        size = (lo + hi) // 2
+        fits, layout = _layout(text, size, box_w, box_h, bold, family, line_gap)
+        if fits:
+            best, lo = layout, size + 1
+        else:
+            hi = size - 1
+    if best is None:
+        fits, best = _layout(text, min_size, box_w, box_h, bold, family, line_gap)
+        if not fits and best.lines:
+            best = _truncate(best, box_w, box_h)
+    return best
@@ -0,0 +1,333 @@
+"""Declarative card templates compiled into reusable render plans.
+
+A card is a JSON file in ``cards/`` (or CARD_TEMPLATE_DIR): a canvas size, a
+background and an ordered list of layers. ``compile_template`` validates it
+once into a plan with fonts resolved and colours converted; ``render`` then
+reuses that plan for every card. The layers up to the first one that uses a
+``{slot}`` are static and drawn once into the card_layers cache; only the
+rest are drawn per card.
+
+Layer types:
+    rect   - {"box": [x0, y0, x1, y1], "fill": colour}
+    text   - {"text", "font", "fill"} at "xy": [x, y], or centred in "box"
+             (plus an optional "offset": [dx, dy])
+    lines  - {"top", "gap", "lines": [{"text", "font", "fill"}, ...]}, each
+             line centred horizontally below the previous one
+    logo   - {"image": [candidate paths], "diameter" (fraction of the width),
+             "pad", "ring", "ring_fill"}: circular logo in the top-right corner
+    title  - {"text", "fallback", "center": [x, y], "max_width", "max_height",
+             "font": {"max_size", "min_size", "bold"}, "line_gap", "fill",
+             "shadow": {"offset", "fill"}, "plate": {"pad", "radius", "fill"}}:
+             fitted with card_layout
+
+Usage:
+    img = card_templates.render("grahak_news", title=title, source=source)
+    jpeg = card_templates.render_bytes("grahak_video", title=title)
+"""
+
+import os
+import json
+import string
+import threading
+from collections import namedtuple
+
+from PIL import Image, ImageDraw
+
+import card_layers
+import card_layout
+import encoding_profiles
+import font_registry
+
+TEMPLATE_DIR = os.getenv("CARD_TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cards"))
+
+# assets are files actually read by the plan; template is the JSON it came from
+Plan = namedtuple("Plan", "name version size background static dynamic assets template")
+
+_lock = threading.Lock()
+_plans = {}  # name -> (template mtime, Plan)
+
+
+class TemplateError(ValueError):
+    """A card template that can't be compiled."""
+
+
+def _resolve_asset(relative):
+    """An asset path as given, next to this module, or in the usual checkouts."""
+    candidates = [
+        relative,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), relative),
+        os.path.join("/workspace/postpilot", relative),
+        os.path.join("/workspaces/postpilot", relative),
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _first_asset(spec):
+    """First existing file of a path or list of candidate paths."""
+    for relative in [spec] if isinstance(spec, str) else spec or []:
+        path = _resolve_asset(relative)
+        if path:
+            return path
+    return None
+
+
+def _colour(value, where):
+    if not isinstance(value, (list, tuple)) or len(value) not in (3, 4):
+        raise TemplateError(f"{where}: colour must be [r, g, b] or [r, g, b, a], got {value!r}")
+    return tuple(int(c) for c in value)
+
+
+def _font(spec, where):
+    if not isinstance(spec, dict) or "size" not in spec:
+        raise TemplateError(f"{where}: font needs a size")
+    return font_registry.font(int(spec["size"]), bold=bool(spec.get("bold")),
+                              family=spec.get("family", font_registry.DEFAULT_FAMILY))
+
+
+def _slots(text):
+    return {field for _, field, _, _ in string.Formatter().parse(text) if field}
+
+
+def _require(layer, keys, where):
+    missing = [k for k in keys if k not in layer]
+    if missing:
+        raise TemplateError(f"{where}: missing {', '.join(missing)}")
+
+
+def _compile_layer(layer, where):
+    """Layer spec -> (kind, compiled spec, slot names it fills)."""
+    kind = layer.get("type")
+    if kind == "rect":
+        _require(layer, ("box", "fill"), where)
+        return kind, {"box": [int(v) for v in layer["box"]], "fill": _colour(layer["fill"], where)}, set()
+    if kind == "text":
+        _require(layer, ("text", "font", "fill"), where)
+        if ("xy" in layer) == ("box" in layer):
+            raise TemplateError(f"{where}: text needs exactly one of xy or box")
+        spec = {
+            "text": layer["text"], "font": _font(layer["font"], where), "fill": _colour(layer["fill"], where),
+            "xy": layer.get("xy"), "box": layer.get("box"), "offset": layer.get("offset", [0, 0]),
+        }
+        return kind, spec, _slots(layer["text"])
+    if kind == "lines":
+        _require(layer, ("top", "lines"), where)
+        lines, slots = [], set()
+        for i, line in enumerate(layer["lines"]):
+            _require(line, ("text", "font", "fill"), f"{where}.lines[{i}]")
+            lines.append({"text": line["text"], "font": _font(line["font"], where),
+                          "fill": _colour(line["fill"], where)})
+            slots |= _slots(line["text"])
+        return kind, {"top": int(layer["top"]), "gap": int(layer.get("gap", 0)), "lines": lines}, slots
+    if kind == "logo":
+        _require(layer, ("image", "diameter"), where)
+        spec = {
+            "path": _first_asset(layer["image"]), "diameter": float(layer["diameter"]),
+            "pad": int(layer.get("pad", 0)), "ring": int(layer.get("ring", 0)),
+            "ring_fill": _colour(layer.get("ring_fill", [0, 0, 0, 0]), where),
+        }
+        return kind, spec, set()
+    if kind == "title":
+        _require(layer, ("text", "center", "max_width", "max_height", "font", "fill"), where)
+        font = layer["font"]
+        shadow = layer.get("shadow")
+        plate = layer.get("plate")
+        spec = {
+            "text": layer["text"], "fallback": layer.get("fallback", ""),
+            "center": [int(v) for v in layer["center"]],
+            "max_width": int(layer["max_width"]), "max_height": int(layer["max_height"]),
+            "max_size": int(font.get("max_size", 84)), "min_size": int(font.get("min_size", 40)),
+            "bold": bool(font.get("bold", True)), "family": font.get("family", font_registry.DEFAULT_FAMILY),
+            "line_gap": int(layer.get("line_gap", 14)), "fill": _colour(layer["fill"], where),
+            "shadow": shadow and {"offset": shadow.get("offset", [3, 3]), "fill": _colour(shadow["fill"], where)},
+            "plate": plate and {"pad": plate.get("pad", [0, 0, 0, 0]), "radius": int(plate.get("radius", 0)),
+                                "fill": _colour(plate["fill"], where)},
+        }
+        if spec["min_size"] > spec["max_size"]:
+            raise TemplateError(f"{where}: min_size is larger than max_size")
+        # a title is always drawn per card, even without slots
+        return kind, spec, _slots(layer["text"]) or {"title"}
+    raise TemplateError(f"{where}: unknown layer type {kind!r}")
+
+
+def compile_template(data, template=None):
+    """Validate a parsed template -> Plan."""
+    name = data.get("name")
+    if not name:
+        raise TemplateError("template has no name")
+    size = data.get("size", [1080, 1080])
+    background = dict(data.get("background", {}))
+    where = f"{name}.background"
+    background["color"] = _colour(background.get("color", [0, 0, 0, 255]), where)
+    background["path"] = _first_asset(background.get("image"))
+    if background.get("gradient"):
+        background["gradient"] = [_colour(c, where) for c in background["gradient"]]
+    static, dynamic = [], []
+    for i, layer in enumerate(data.get("layers", [])):
+        kind, spec, slots = _compile_layer(layer, f"{name}.layers[{i}]")
+        # keep z-order: everything from the first per-card layer on is drawn per card
+        (dynamic if slots or dynamic else static).append((kind, spec))
+    assets = [background["path"]] + [spec["path"] for kind, spec in static if kind == "logo"]
+    return Plan(name, int(data.get("version", 1)), (int(size[0]), int(size[1])), background,
+                static, dynamic, tuple(p for p in assets if p), template)
+
+
+def template_path(name):
+    return os.path.join(TEMPLATE_DIR, f"{name}.json")
+
+
+def load(name):
+    """Compiled plan for a template in TEMPLATE_DIR, recompiled if the file changed."""
+    path = template_path(name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        raise TemplateError(f"no card template {name!r} at {path}")
+    cached = _plans.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with _lock:
+        cached = _plans.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise TemplateError(f"{path}: {e}")
+        plan = compile_template(data, template=path)
+        _plans[name] = (mtime, plan)
+        return plan
+
+
+def _draw_gradient(img, start, end):
+    w, h = img.size
+    draw = ImageDraw.Draw(img)
+    for i in range(h):
+        r = int(start[0] + (end[0]-start[0]) * (i/h))
+        g = int(start[1] + (end[1]-start[1]) * (i/h))
+        b = int(start[2] + (end[2]-start[2]) * (i/h))
+        draw.line([(0, i), (w, i)], fill=(r, g, b))
+
+
+def _draw_logo(img, draw, spec):
+    if not spec["path"]:
+        return
+    width = img.size[0]
+    diameter = int(width * spec["diameter"])
+    logo = Image.open(spec["path"]).convert("RGBA").resize((diameter, diameter), Image.Resampling.LANCZOS)
+
+    # circular crop for logo
+    mask = Image.new("L", (diameter, diameter), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, diameter, diameter), fill=255)
+    circle_logo = Image.new("RGBA", (diameter, diameter), (0, 0, 0, 0))
+    circle_logo.paste(logo, (0, 0), mask)
+
+    pad, ring = spec["pad"], spec["ring"]
+    x = width - diameter - pad
+    y = pad
+    draw.ellipse([x - ring, y - ring, x + diameter + ring, y + diameter + ring], fill=spec["ring_fill"])
+    img.paste(circle_logo, (x, y), circle_logo)
+
+
+def _draw_title(img, draw, spec, values):
+    text = spec["text"].format(**values).strip() or spec["fallback"]
+    layout = card_layout.fit(text, spec["max_width"], spec["max_height"], max_size=spec["max_size"],
+                             min_size=spec["min_size"], bold=spec["bold"], family=spec["family"],
+                             line_gap=spec["line_gap"])
+    cx, cy = spec["center"]
+    y = cy - layout.total_h // 2
+    for line, w, h in zip(layout.lines, layout.widths, layout.heights):
+        x = (2 * cx - w) // 2
+        if spec["plate"]:
+            left, top, right, bottom = spec["plate"]["pad"]
+            draw.rounded_rectangle([x - left, y - top, x + w + right, y + h + bottom],
+                                   radius=spec["plate"]["radius"], fill=spec["plate"]["fill"])
+        if spec["shadow"]:
+            dx, dy = spec["shadow"]["offset"]
+            draw.text((x + dx, y + dy), line, font=layout.font, fill=spec["shadow"]["fill"])
+        draw.text((x, y), line, font=layout.font, fill=spec["fill"])
+        y += h + layout.line_gap
+
+
+def _draw_layers(img, layers, values):
+    draw = ImageDraw.Draw(img, "RGBA")
+    width = img.size[0]
+    for kind, spec in layers:
+        if kind == "rect":
+            draw.rectangle(spec["box"], fill=spec["fill"])
+        elif kind == "text":
+            text = spec["text"].format(**values)
+            dx, dy = spec["offset"]
+            if spec["xy"]:
+                x, y = spec["xy"]
+            else:
+                x0, y0, x1, y1 = spec["box"]
+                w, h = font_registry.text_size(text, spec["font"])
+                x, y = x0 + (x1 - x0 - w) / 2, y0 + (y1 - y0 - h) / 2
+            draw.text((x + dx, y + dy), text, font=spec["font"], fill=spec["fill"])
+        elif kind == "lines":
+            y = spec["top"]
+            for line in spec["lines"]:
+                text = line["text"].format(**values)
+                w, h = font_registry.text_size(text, line["font"])
+                draw.text(((width - w) / 2, y), text, font=line["font"], fill=line["fill"])
+                y += h + spec["gap"]
+        elif kind == "logo":
+            _draw_logo(img, draw, spec)
+        elif kind == "title":
+            _draw_title(img, draw, spec, values)
+
+
+def _build_base(plan):
+    img = Image.new("RGBA", plan.size, color=plan.background["color"])
+    if plan.background["path"]:
+        bg = Image.open(plan.background["path"]).convert("RGBA").resize(plan.size, Image.Resampling.LANCZOS)
+        img.paste(bg, (0, 0))
+    elif plan.background.get("gradient"):
+        _draw_gradient(img, *plan.background["gradient"])
+    _draw_layers(img, plan.static, {})
+    return img
+
+
+def _base(plan):
+    assets = plan.assets + ((plan.template,) if plan.template else ())
+    return card_layers.base(plan.name, plan.version, lambda: _build_base(plan), assets=assets)
+
+
+def render(name, **values):
+    """RGBA card for template ``name`` with its {slots} filled from ``values``."""
+    plan = load(name)
+    img = _base(plan)
+    _draw_layers(img, plan.dynamic, values)
+    return img
+
+
+def render_bytes(name, profile=encoding_profiles.DEFAULT, **values):
+    """render() encoded in memory with an encoding_profiles profile."""
+    return encoding_profiles.encode(render(name, **values), profile)
+
+
+def render_encoded(name, profiles, **values):
+    """One render encoded per profile -> {profile: bytes}."""
+    img = render(name, **values)
+    return {profile: encoding_profiles.encode(img, profile) for profile in profiles}
+
+
+def render_file(name, path, profile=encoding_profiles.DEFAULT, **values):
+    """render_bytes() written to ``path`` -> path (only when a file is wanted)."""
+    with open(path, "wb") as f:
+        f.write(render_bytes(name, profile, **values))
+    return path
+
+
+def warm(name):
+    """Compile a template, build its static layer and open its title fonts."""
+    plan = load(name)
+    _base(plan)
+    for kind, spec in plan.dynamic:
+        if kind == "title":
+            for size in range(spec["min_size"], spec["max_size"] + 1):
+                font_registry.font(size, bold=spec["bold"], family=spec["family"])
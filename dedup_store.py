@@ -0,0 +1,203 @@
+"""Shared dedup store: in-memory hash index over an append-only log.
+
+Replaces the linear scans of posted_news.txt / posted_videos.txt / posted.txt.
+Each store keeps ``{key: first_seen_epoch}`` in memory and appends
+``<epoch>\\t<key>`` lines to a sibling ``.dedup`` log, which several
+processes may share: a key not found in memory is looked up again after
+reading what others appended. Keys are kept forever unless
+DEDUP_RETENTION_DAYS sets a retention window, and the log is compacted in the
+background once dead lines outnumber live ones.
+
+Usage:
+    store = dedup_store.get_store("posted_news.txt")
+    if title not in store:
+        ...
+        store.add(title)
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# keep keys for this many days (0, the default, keeps them forever)
+RETENTION_DAYS = float(os.getenv("DEDUP_RETENTION_DAYS", "0"))
+# seconds between background compaction checks (0 disables the thread)
+COMPACT_INTERVAL = float(os.getenv("DEDUP_COMPACT_INTERVAL", "3600"))
+# don't bother compacting logs with fewer dead lines than this
+COMPACT_MIN_DEAD = 256
+
+LOG_SUFFIX = ".dedup"
+
+
+def _clean_key(key: str) -> str:
+    return str(key).replace("\r", " ").replace("\n", " ").replace("\t", " ")
+
+
+class DedupStore:
+    """O(1) membership set backed by an append-only, compacting log."""
+
+    def __init__(self, legacy_path: str, retention_days: float | None = None,
+                 compact_interval: float | None = None):
+        self.legacy_path = legacy_path
+        self.path = os.path.splitext(legacy_path)[0] + LOG_SUFFIX
+        self.retention = (RETENTION_DAYS if retention_days is None else retention_days) * 86400
+        self._lock = threading.Lock()
+        self._index: dict[str, float] = {}
+        self._lines = 0
+        self._offset = 0
+        self._stop = threading.Event()
+
+        if not os.path.exists(self.path):
+            self._migrate_legacy()
+        with self._lock:
+            self._read_log()
+        if self._needs_compaction():
+            self.compact()
+
+        interval = COMPACT_INTERVAL if compact_interval is None else compact_interval
+        if interval > 0:
+            t = threading.Thread(target=self._compact_loop, args=(interval,), daemon=True)
+            t.start()
+
+    def __contains__(self, key: str) -> bool:
+        key = _clean_key(key)
+        ts = self._index.get(key)
+        if ts is None or self._expired(ts, time.time()):
+            # another process sharing the log may have added it since our last read
+            with self._lock:
+                self._read_log()
+                ts = self._index.get(key)
+            if ts is None or self._expired(ts, time.time()):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, key: str) -> None:
+        """Record key as seen; no-op if it is already live."""
+        key = _clean_key(key)
+        now = time.time()
+        with self._lock:
+            self._read_log()
+            ts = self._index.get(key)
+            if ts is not None and not self._expired(ts, now):
+                return
+            self._append([(key, now)])
+
+    def compact(self) -> None:
+        """Rewrite the log with only live entries (atomic replace)."""
+        with self._lock:
+            # pick up lines appended by other processes since our last read
+            self._read_log()
+            now = time.time()
+            live = {k: ts for k, ts in self._index.items() if not self._expired(ts, now)}
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for k, ts in live.items():
+                        f.write(f"{int(ts)}\t{k}\n")
+                os.replace(tmp, self.path)
+            except Exception as e:
+                logger.error(f"dedup compaction failed for {self.path}: {e}")
+                return
+            self._index = live
+            self._lines = len(live)
+            self._offset = os.path.getsize(self.path)
+
+    def close(self) -> None:
+        self._stop.set()
+
+    # internals
+
+    def _expired(self, ts: float, now: float) -> bool:
+        return self.retention > 0 and now - ts > self.retention
+
+    def _needs_compaction(self) -> bool:
+        dead = self._lines - len(self._index)
+        if self.retention > 0:
+            now = time.time()
+            dead += sum(1 for ts in self._index.values() if self._expired(ts, now))
+        return dead >= COMPACT_MIN_DEAD and dead > len(self._index)
+
+    def _compact_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                if self._needs_compaction():
+                    self.compact()
+            except Exception as e:
+                logger.error(f"dedup background compaction failed: {e}")
+
+    def _read_log(self) -> None:
+        """Load log lines past the last known offset into the index."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size < self._offset:
+            # replaced by another process's compaction; reload from scratch
+            self._index, self._lines, self._offset = {}, 0, 0
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for raw in data[:end].decode("utf-8", errors="replace").splitlines():
+            ts, sep, key = raw.partition("\t")
+            if not sep or not key:
+                continue
+            try:
+                ts = float(ts)
+            except ValueError:
+                continue
+            self._lines += 1
+            self._index.setdefault(key, ts)
+            if ts > self._index[key]:
+                self._index[key] = ts
+        self._offset += end
+
+    def _append(self, entries) -> None:
+        data = "".join(f"{int(ts)}\t{k}\n" for k, ts in entries)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+        except Exception as e:
+            logger.error(f"error writing to {self.path}: {e}")
+            return
+        # read our lines back rather than advancing _offset past them: another
+        # process may have appended in between
+        self._read_log()
+
+    def _migrate_legacy(self) -> None:
+        """Seed the log from a plain one-key-per-line txt file."""
+        if not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                keys = [_clean_key(line.strip()) for line in f if line.strip()]
+        except Exception as e:
+            logger.error(f"error reading {self.legacy_path}: {e}")
+            return
+        now = time.time()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for k in dict.fromkeys(keys):
+                f.write(f"{int(now)}\t{k}\n")
+        os.replace(tmp, self.path)
+        logger.info(f"migrated {len(keys)} keys from {self.legacy_path} to {self.path}")
+
+
+_stores: dict[str, DedupStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(legacy_path: str, **kwargs) -> DedupStore:
+    """Return the process-wide store for a posted-ids file, opening it once."""
+    key = os.path.abspath(legacy_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = DedupStore(legacy_path, **kwargs)
+        return store
@@ -0,0 +1,366 @@
+"""Local stand-in for the parts of the Graph API PostPilot uses.
+
+Serves me, me/accounts, debug_token, {page}?fields=..., {page}/photos,
+{photo}?fields=images, {page}/posts, {ig}/media, {container}?fields=status_code,
+{ig}/media_publish, {ig}/content_publishing_limit, ?ids= lookups and the
+/?batch= endpoint, all from in-memory state seeded with the pages in
+fixtures/graph_accounts.json. Latency, error rate, throttling and the
+usage headers are configurable, so the publishing pipeline can be run and
+timed without Facebook credentials.
+
+Point PostPilot at it with GRAPH_BASE_URL:
+    python fake_graph.py --port 5055 --latency 120 --error-rate 0.02
+    GRAPH_BASE_URL=http://127.0.0.1:5055 python grahak_news_auto.py
+
+or start it in-process (see bench_publish.py):
+    server, base_url = fake_graph.start(latency_ms=50)
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+import itertools
+from urllib.parse import parse_qsl, urlsplit
+
+from flask import Flask, jsonify, request
+
+FIXTURES = os.getenv("FAKE_GRAPH_FIXTURES", os.path.join("fixtures", "graph_accounts.json"))
+
+# defaults; override with start(...) or the command line
+CONFIG = {
+    'latency_ms': 0.0,  # mean added latency per call
+    'jitter_ms': 0.0,  # +/- uniform jitter around the mean
+    'upload_latency_ms': 0.0,  # extra latency for photo uploads
+    'error_rate': 0.0,  # fraction of calls answering a transient 500
+    'throttle_rate': 0.0,  # fraction of calls answering a code 4 throttle
+    'app_usage': 0,  # percent reported in X-App-Usage
+    'container_ready_ms': 1500.0,  # time until an IG container is FINISHED
+    'ig_quota_total': 100,
+}
+
+app = Flask(__name__)
+
+_lock = threading.Lock()
+_ids = itertools.count(10 ** 15)
+_state = {}
+_stats = {'calls': 0, 'errors': 0, 'throttled': 0, 'by_route': {}}
+
+
+def _load_fixtures():
+    try:
+        with open(FIXTURES, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {
+            'me': {'id': '100000000000001', 'name': 'PostPilot Test User'},
+            'pages': [{'id': '900000000000001', 'name': 'Test Page', 'ig_id': '17840000000000001'}],
+        }
+
+
+def reset():
+    """Forget every upload/container and reload the fixtures."""
+    fixtures = _load_fixtures()
+    with _lock:
+        _state.clear()
+        _state.update(
+            me=fixtures['me'],
+            pages={p['id']: dict(p, access_token=f"PAGE_TOKEN_{p['id']}") for p in fixtures['pages']},
+            photos={},  # photo id -> {'page_id', 'caption', 'bytes'}
+            containers={},  # container id -> {'ig_id', 'image_url', 'ready_at', 'published'}
+            media={},  # ig id -> [media ids]
+        )
+        _stats.update(calls=0, errors=0, throttled=0, by_route={})
+
+
+def _new_id():
+    return str(next(_ids))
+
+
+def _error(message, code, status=400, transient=False):
+    body = {'error': {'message': message, 'type': 'OAuthException', 'code': code,
+                      'is_transient': transient, 'fbtrace_id': 'fake'}}
+    return body, status
+
+
+def _usage_headers():
+    usage = CONFIG['app_usage']
+    return {'X-App-Usage': json.dumps({'call_count': usage, 'total_cputime': usage // 2, 'total_time': usage // 2})}
+
+
+# --- handlers: (method, path parts, params, files) -> (body, status) ---
+
+def _me(params):
+    return dict(_state['me']), 200
+
+
+def _accounts(params):
+    data = []
+    for page in _state['pages'].values():
+        entry = {'id': page['id'], 'name': page['name'], 'access_token': page['access_token'],
+                 'category': 'Media/News Company'}
+        if page.get('ig_id'):
+            entry['instagram_business_account'] = {'id': page['ig_id']}
+        data.append(entry)
+    return {'data': data, 'paging': {'cursors': {'before': 'a', 'after': 'b'}}}, 200
+
+
+def _node(node_id, params):
+    fields = set(filter(None, params.get('fields', '').split(',')))
+    if node_id in _state['pages']:
+        page = _state['pages'][node_id]
+        body = {'id': node_id}
+        if 'name' in fields:
+            body['name'] = page['name']
+        if 'instagram_business_account' in fields and page.get('ig_id'):
+            body['instagram_business_account'] = {'id': page['ig_id']}
+        return body, 200
+    if node_id in _state['photos']:
+        return {'id': node_id, 'images': [
+            {'height': 1080, 'width': 1080, 'source': f"{request.host_url}fake-cdn/{node_id}_1080.jpg"},
+            {'height': 320, 'width': 320, 'source': f"{request.host_url}fake-cdn/{node_id}_320.jpg"},
+        ]}, 200
+    if node_id in _state['containers']:
+        container = _state['containers'][node_id]
+        if container['published']:
+            code = 'PUBLISHED'
+        elif time.time() >= container['ready_at']:
+            code = 'FINISHED'
+        else:
+            code = 'IN_PROGRESS'
+        return {'id': node_id, 'status_code': code, 'status': code}, 200
+    return _error(f"Unsupported get request. Object with ID '{node_id}' does not exist", 100)
+
+
+def _ids_lookup(params):
+    out = {}
+    for node_id in filter(None, params['ids'].split(',')):
+        body, status = _node(node_id, params)
+        if status == 200:
+            out[node_id] = body
+    return out, 200
+
+
+def _photos(page_id, params, files):
+    if page_id not in _state['pages']:
+        return _error("Invalid page id", 100)
+    if params.get('access_token') != _state['pages'][page_id]['access_token']:
+        return _error("Invalid OAuth access token.", 190, status=401)
+    if not files and not params.get('url'):
+        return _error("(#324) Requires upload file", 324)
+    time.sleep(CONFIG['upload_latency_ms'] / 1000)
+    photo_id = _new_id()
+    size = sum(len(f.read()) for f in files.values()) if files else 0
+    _state['photos'][photo_id] = {'page_id': page_id, 'caption': params.get('caption', ''), 'bytes': size}
+    return {'id': photo_id, 'post_id': f"{page_id}_{photo_id}"}, 200
+
+
+def _posts(page_id, params):
+    data = []
+    for photo_id, photo in list(_state['photos'].items())[-25:][::-1]:
+        if photo['page_id'] != page_id:
+            continue
+        data.append({
+            'id': f"{page_id}_{photo_id}",
+            'message': photo['caption'],
+            'attachments': {'data': [{'type': 'photo', 'media': {'image': {
+                'src': f"{request.host_url}fake-cdn/{photo_id}_1080.jpg"}}}]},
+        })
+    return {'data': data}, 200
+
+
+def _media(ig_id, params):
+    if not params.get('image_url'):
+        return _error("The parameter image_url is required", 100)
+    container_id = _new_id()
+    _state['containers'][container_id] = {
+        'ig_id': ig_id, 'image_url': params['image_url'], 'published': False,
+        'ready_at': time.time() + CONFIG['container_ready_ms'] / 1000,
+    }
+    return {'id': container_id}, 200
+
+
+def _media_publish(ig_id, params):
+    container = _state['containers'].get(params.get('creation_id', ''))
+    if container is None:
+        return _error("Invalid creation_id", 100)
+    if time.time() < container['ready_at']:
+        body, status = _error("Media ID is not available", 9007)
+        body['error']['error_subcode'] = 2207027
+        return body, status
+    if len(_state['media'].get(ig_id, [])) >= CONFIG['ig_quota_total']:
+        return _error("Application request limit reached", 9, status=400)
+    container['published'] = True
+    media_id = _new_id()
+    _state['media'].setdefault(ig_id, []).append(media_id)
+    return {'id': media_id}, 200
+
+
+def _publishing_limit(ig_id, params):
+    return {'data': [{'quota_usage': len(_state['media'].get(ig_id, [])),
+                      'config': {'quota_total': CONFIG['ig_quota_total'], 'quota_duration': 86400}}]}, 200
+
+
+def _parts(path):
+    parts = [p for p in path.strip('/').split('/') if p]
+    # tolerate a version prefix (v19.0/...) or none
+    if parts and parts[0].startswith('v') and parts[0][1:2].isdigit():
+        parts = parts[1:]
+    return parts
+
+
+def _dispatch(method, path, params, files):
+    parts = _parts(path)
+    route = f"{method} /{'/'.join('{id}' if p.isdigit() else p for p in parts)}"
+    with _lock:
+        _stats['by_route'][route] = _stats['by_route'].get(route, 0) + 1
+        if method == 'GET':
+            if parts == ['me']:
+                return _me(params)
+            if parts == ['me', 'accounts']:
+                return _accounts(params)
+            if parts == ['debug_token']:
+                return {'data': {'is_valid': True, 'expires_at': 0}}, 200
+            if not parts and params.get('ids'):
+                return _ids_lookup(params)
+            if len(parts) == 1:
+                return _node(parts[0], params)
+            if len(parts) == 2 and parts[1] == 'posts':
+                return _posts(parts[0], params)
+            if len(parts) == 2 and parts[1] == 'content_publishing_limit':
+                return _publishing_limit(parts[0], params)
+        if method == 'POST' and len(parts) == 2:
+            if parts[1] == 'media':
+                return _media(parts[0], params)
+            if parts[1] == 'media_publish':
+                return _media_publish(parts[0], params)
+    if method == 'POST' and len(parts) == 2 and parts[1] == 'photos':
+        # outside the lock so uploads overlap like the real thing
+        return _photos(parts[0], params, files)
+    return _error(f"Unknown path components: /{'/'.join(parts)}", 2500)
+
+
+def _resolve_refs(text, results):
+    """Substitute {result=name:$.path} references (supports $.id, $.data.*.id)."""
+    while '{result=' in text:
+        start = text.index('{result=')
+        end = text.index('}', start)
+        name, _, expr = text[start + 8:end].partition(':')
+        value = results.get(name)
+        for key in expr.lstrip('$.').split('.'):
+            if value is None:
+                break
+            if key == '*':
+                value = value if isinstance(value, list) else []
+            elif isinstance(value, list):
+                value = [v.get(key) for v in value if isinstance(v, dict)]
+            else:
+                value = value.get(key)
+        if value is None:
+            return None
+        value = ','.join(map(str, value)) if isinstance(value, list) else str(value)
+        text = text[:start] + value + text[end + 1:]
+    return text
+
+
+def _batch(params, files):
+    calls = json.loads(params['batch'])
+    results, out = {}, []
+    for call in calls:
+        relative = _resolve_refs(call['relative_url'], results)
+        if relative is None:
+            # a dependency failed: Graph returns null for this call
+            out.append(None)
+            continue
+        split = urlsplit(relative)
+        call_params = {'access_token': params.get('access_token')}
+        call_params.update(parse_qsl(split.query))
+        call_params.update(parse_qsl(_resolve_refs(call.get('body', ''), results) or ''))
+        attached = {k: files[k] for k in call.get('attached_files', '').split(',') if k in files}
+        body, status = _dispatch(call['method'].upper(), split.path, call_params, attached)
+        if call.get('name') and status < 400:
+            results[call['name']] = body
+        if call.get('name') and call.get('omit_response_on_success', True) and status < 400:
+            out.append(None)
+            continue
+        out.append({'code': status, 'headers': [], 'body': json.dumps(body)})
+    return out, 200
+
+
+@app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'DELETE'])
+@app.route('/<path:path>', methods=['GET', 'POST', 'DELETE'])
+def graph(path):
+    params = dict(request.args)
+    params.update(request.form)
+    delay = CONFIG['latency_ms'] + random.uniform(-1, 1) * CONFIG['jitter_ms']
+    time.sleep(max(0.0, delay) / 1000)
+    with _lock:
+        _stats['calls'] += 1
+        roll = random.random()
+        if roll < CONFIG['throttle_rate']:
+            _stats['throttled'] += 1
+            body, status = _error("(#4) Application request limit reached", 4, status=403, transient=True)
+        elif roll < CONFIG['throttle_rate'] + CONFIG['error_rate']:
+            _stats['errors'] += 1
+            body, status = _error("An unexpected error has occurred. Please retry your request later.",
+                                  2, status=500, transient=True)
+        else:
+            body = None
+    if body is None:
+        if request.method == 'POST' and 'batch' in params and not _parts(path):
+            body, status = _batch(params, request.files)
+        else:
+            body, status = _dispatch(request.method, path, params, request.files)
+    response = jsonify(body)
+    response.status_code = status
+    response.headers.update(_usage_headers())
+    return response
+
+
+@app.route('/_fake/stats')
+def stats():
+    with _lock:
+        return jsonify(dict(_stats, config=CONFIG,
+                            photos=len(_state['photos']), published=sum(map(len, _state['media'].values()))))
+
+
+def start(host='127.0.0.1', port=0, **config):
+    """Run the fake server in a background thread -> (server, base_url)."""
+    from werkzeug.serving import make_server
+
+    CONFIG.update(config)
+    reset()
+    # per-request access logs would drown a benchmark's output
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+reset()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fake Graph API server for offline runs and benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--latency', type=float, default=CONFIG['latency_ms'], help='mean latency per call (ms)')
+    parser.add_argument('--jitter', type=float, default=CONFIG['jitter_ms'], help='+/- latency jitter (ms)')
+    parser.add_argument('--upload-latency', type=float, default=CONFIG['upload_latency_ms'],
+                        help='extra latency for photo uploads (ms)')
+    parser.add_argument('--error-rate', type=float, default=CONFIG['error_rate'])
+    parser.add_argument('--throttle-rate', type=float, default=CONFIG['throttle_rate'])
+    parser.add_argument('--app-usage', type=int, default=CONFIG['app_usage'], help='X-App-Usage percent')
+    parser.add_argument('--container-ready', type=float, default=CONFIG['container_ready_ms'],
+                        help='ms until an IG container is FINISHED')
+    args = parser.parse_args()
+
+    CONFIG.update(latency_ms=args.latency, jitter_ms=args.jitter, upload_latency_ms=args.upload_latency,
+                  error_rate=args.error_rate, throttle_rate=args.throttle_rate, app_usage=args.app_usage,
+                  container_ready_ms=args.container_ready)
+    print(f"fake Graph API on http://{args.host}:{args.port} (GRAPH_BASE_URL)")
+    app.run(host=args.host, port=args.port, threaded=True)
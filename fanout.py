@@ -0,0 +1,139 @@
+"""Publish one asset to many Facebook pages and Instagram accounts at once.
+
+Targets are ``{'kind': 'page' | 'instagram', 'id': ...}`` dicts (see
+``targets_for`` to build them from page ids via the page directory). Every
+target is published concurrently through a bounded pool; publish pacing
+still goes through rate_governor. Instagram needs a public image URL: pass
+``image_url`` (e.g. a signed /images URL), otherwise the Facebook copy from
+the first page upload is used.
+
+Usage:
+    results = fanout.publish("images/abc.jpg", "caption", fanout.targets_for([PAGE_A, PAGE_B]))
+    python fanout.py images/abc.jpg "caption" PAGE_A PAGE_B [--no-instagram]
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import graph_client
+import ig_container
+import image_store
+import page_directory
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("FANOUT_WORKERS", "8"))
+
+
+def targets_for(page_ids, instagram=True, user_token=None):
+    """Page targets, each followed by its linked IG account (if any and wanted)."""
+    targets = []
+    for page_id in page_ids:
+        targets.append({'kind': 'page', 'id': str(page_id)})
+        ig_id = instagram and page_directory.ig_account(page_id, user_token)
+        if ig_id:
+            targets.append({'kind': 'instagram', 'id': ig_id, 'page_id': str(page_id)})
+    return targets
+
+
+def _to_page(page_id, image_path, caption, user_token, read_back):
+    token = page_directory.page_token(page_id, user_token)
+    if not token:
+        raise RuntimeError(f"no page token for {page_id}")
+    with open(image_path, 'rb') as f:
+        res, info = graph_client.upload_photo(
+            f"{page_id}/photos", (os.path.basename(image_path), f, 'image/jpeg'),
+            {'caption': caption, 'access_token': token},
+            fields="images" if read_back else None,
+        )
+    if 'error' in res:
+        raise RuntimeError(res['error'].get('message', 'upload failed'))
+    images = (info or {}).get('images') or []
+    return {'id': res.get('id'), 'image_url': images[0].get('source') if images else None}
+
+
+def _to_instagram(target, caption, image_url, user_token):
+    url = image_url.result() if isinstance(image_url, Future) else image_url
+    if not url:
+        raise RuntimeError("no public image URL to publish from")
+    # the linked page's token can publish for its IG account
+    token = (target.get('page_id') and page_directory.page_token(target['page_id'], user_token)) or user_token
+    media_id = ig_container.publish_photo(target['id'], url, caption, token)
+    if not media_id:
+        raise RuntimeError("instagram publish failed (see log)")
+    return {'id': media_id}
+
+
+def _timed(fn, *args):
+    start = time.monotonic()
+    try:
+        out = fn(*args)
+        return dict(out, ok=True, seconds=round(time.monotonic() - start, 2))
+    except Exception as e:
+        return {'ok': False, 'error': str(e), 'seconds': round(time.monotonic() - start, 2)}
+
+
+def publish(image_path, caption, targets, image_url=None, user_token=None, workers=None):
+    """Publish to every target concurrently -> one result dict per target, in order.
+
+    Each result has 'kind', 'target', 'ok', 'seconds' and either the new
+    post/media 'id' or an 'error'. A failing target never affects the others.
+    """
+    user_token = user_token or page_directory.default_token()
+    pages = [t for t in targets if t['kind'] == 'page']
+    igs = [t for t in targets if t['kind'] == 'instagram']
+    if igs and image_url is None and not pages:
+        raise ValueError("Instagram targets need image_url or at least one page target")
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers or WORKERS)) as pool:
+        url_source = image_url
+        for i, target in enumerate(pages):
+            # only one upload needs to read back FB's copy for Instagram
+            read_back = bool(igs) and image_url is None and i == 0
+            future = pool.submit(_timed, _to_page, target['id'], image_path, caption, user_token, read_back)
+            results[id(target)] = future
+            if read_back:
+                url_source = Future()
+                future.add_done_callback(
+                    lambda f, src=url_source: src.set_result(f.result().get('image_url'))
+                )
+        # page uploads are queued first, so IG tasks waiting on url_source can't starve them
+        for target in igs:
+            results[id(target)] = pool.submit(_timed, _to_instagram, target, caption, url_source, user_token)
+    out = []
+    for target in targets:
+        result = results[id(target)].result()
+        result.update(kind=target['kind'], target=target['id'])
+        out.append(result)
+        if not result['ok']:
+            logger.warning(f"fan-out to {target['kind']} {target['id']} failed: {result['error']}")
+    return out
+
+
+def publish_library_image(image_filename, caption, targets, base_url=None, **kwargs):
+    """publish() for a library image; IG gets a signed /images URL when enabled."""
+    image_url = None
+    if image_store.direct_urls_enabled():
+        image_url = image_store.signed_url(image_filename, base_url or os.environ['STATIC_BASE_URL'])
+    return publish(image_store.upload_path(image_filename), caption, targets, image_url=image_url, **kwargs)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Publish one image to several pages (and their IG accounts)')
+    parser.add_argument('image', help='image file to publish')
+    parser.add_argument('caption')
+    parser.add_argument('page_ids', nargs='+')
+    parser.add_argument('--no-instagram', action='store_true', help='skip linked Instagram accounts')
+    parser.add_argument('--image-url', help='public URL of the image for Instagram')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    found = targets_for(args.page_ids, instagram=not args.no_instagram)
+    for r in publish(args.image, args.caption, found, image_url=args.image_url, workers=args.workers):
+        print(json.dumps(r))
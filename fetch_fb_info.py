@@ -7,7 +7,7 @@ This will read FB_TOKEN from .env and list pages you manage along with their IDs
 plus try to retrieve connected Instagram business account IDs if available.
 """
 import os
-import requests
+import graph_client
 
 # simple .env loader
 def load_env(path):
@@ -30,33 +30,32 @@ if not FB_TOKEN:
     print("FB_TOKEN not set in .env")
     exit(1)
 
-base_url = "https://graph.facebook.com/v19.0"
-
 print("Using token from .env.")
 
-# get user info
-user_resp = requests.get(f"{base_url}/me?access_token={FB_TOKEN}").json()
+# user info, managed pages and their linked IG accounts in one batch request;
+# the third call fans out over the page ids returned by the second
+user_resp, pages_resp, ig_resp = graph_client.batch([
+    graph_client.call("me"),
+    graph_client.call("me/accounts", {"fields": "id,name"}, name="pages"),
+    graph_client.call("", {"ids": "{result=pages:$.data.*.id}", "fields": "instagram_business_account"}),
+], FB_TOKEN)
 print("User:", user_resp)
 
-# get pages managed by this user
-pages_resp = requests.get(f"{base_url}/me/accounts?access_token={FB_TOKEN}").json()
 print("Pages you manage:")
 updates = {}
-for p in pages_resp.get("data", []):
+for p in (pages_resp or {}).get("data", []):
     name = p.get('name')
     page_id = p.get('id')
     print(f"  {name} (id={page_id})")
     # gather variable-friendly name
     var_base = name.upper().replace(' ', '_').replace('.', '_')
     updates[f"FB_PAGE_ID_{var_base}"] = page_id
-    # try to fetch insta business account id if connected
-    if page_id:
-        ig_resp = requests.get(f"{base_url}/{page_id}?fields=instagram_business_account&access_token={FB_TOKEN}").json()
-        ig_acc = ig_resp.get('instagram_business_account')
-        if ig_acc:
-            ig_id = ig_acc.get('id')
-            print(f"    Instagram business account id: {ig_id}")
-            updates[f"INSTA_ID_{var_base}"] = ig_id
+    # insta business account id, if connected
+    ig_acc = (ig_resp or {}).get(page_id, {}).get('instagram_business_account')
+    if ig_acc:
+        ig_id = ig_acc.get('id')
+        print(f"    Instagram business account id: {ig_id}")
+        updates[f"INSTA_ID_{var_base}"] = ig_id
 
 # write updates back to .env
 if updates:
@@ -0,0 +1,108 @@
+"""Process-wide font registry for the card renderers.
+
+Resolves each family/weight to a font file once, keeps one ``FreeTypeFont``
+per (family, size, weight) and memoizes text measurements per (font, text),
+so fitting a title costs dictionary lookups instead of repeated font loads
+and ``textbbox`` calls.
+
+Usage:
+    font = font_registry.font(64, bold=True)
+    w, h = font_registry.text_size("Headline", font)
+    step = font_registry.line_height(font)
+"""
+
+import os
+import logging
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# candidate files per family and weight, tried in order (Termux-friendly fallbacks)
+FAMILIES = {
+    "sans": {
+        False: [
+            "DejaVuSans.ttf",
+            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+            "/data/data/com.termux/files/usr/share/fonts/TTF/DejaVuSans.ttf",
+            "/data/data/com.termux/files/usr/share/fonts/TTF/NotoSans-Regular.ttf",
+            "arial.ttf",
+        ],
+        True: [
+            "DejaVuSans-Bold.ttf",
+            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+            "/data/data/com.termux/files/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
+            "/data/data/com.termux/files/usr/share/fonts/TTF/NotoSans-Bold.ttf",
+            "arialbd.ttf",
+        ],
+    },
+}
+DEFAULT_FAMILY = "sans"
+
+_lock = threading.Lock()
+_paths = {}  # (family, bold) -> font file, or None for PIL's bitmap font
+# textbbox on an "L" image measures exactly like the renderers' RGBA draws
+_measure = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+
+def font_path(family=DEFAULT_FAMILY, bold=False):
+    """The font file for a family/weight, resolved once (None: no scalable font)."""
+    key = (family, bold)
+    if key in _paths:
+        return _paths[key]
+    with _lock:
+        if key not in _paths:
+            env_font = os.getenv("GRAHAK_FONT_PATH_BOLD" if bold else "GRAHAK_FONT_PATH")
+            path = None
+            for candidate in [env_font, *FAMILIES[family][bold]]:
+                if not candidate:
+                    continue
+                try:
+                    ImageFont.truetype(candidate, 10)
+                except Exception:
+                    continue
+                path = candidate
+                break
+            if path is None:
+                logger.warning("no scalable font found; using PIL default bitmap font")
+            _paths[key] = path
+    return _paths[key]
+
+
+@lru_cache(maxsize=256)
+def _font(family, size, bold):
+    path = font_path(family, bold)
+    if path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(path, size)
+
+
+def font(size, bold=False, family=DEFAULT_FAMILY):
+    """Shared font object for (family, size, weight); don't mutate it."""
+    return _font(family, size, bold)
+
+
+@lru_cache(maxsize=8192)
+def text_size(text, font):
+    """(width, height) of ``text``'s bounding box in ``font``."""
+    bbox = _measure.textbbox((0, 0), text, font=font)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+@lru_cache(maxsize=256)
+def line_height(font):
+    """Height of one line of ``font`` (ascent + descent), whatever the text."""
+    if hasattr(font, "getmetrics"):
+        return sum(font.getmetrics())
+    return text_size("Hg", font)[1]
+
+
+def clear():
+    """Forget resolved paths, fonts and measurements (e.g. after installing fonts)."""
+    with _lock:
+        _paths.clear()
+    _font.cache_clear()
+    text_size.cache_clear()
+    line_height.cache_clear()
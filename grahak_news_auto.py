@@ -4,24 +4,37 @@
 import os
 import sys
 import logging
-import textwrap
-import uuid
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import feedparser
-import requests
 from dotenv import load_dotenv
-from PIL import Image, ImageDraw, ImageFont
 
-# load environment
-load_dotenv()
+# load environment first: the project modules below read their settings at
+# import. Only when run as a script: render_pool's worker processes re-import
+# this file (as __mp_main__) and already inherit the environment
+if __name__ == "__main__":
+    load_dotenv()
+
+import card_templates
+import dedup_store
+import graph_client
+import image_store
+import ig_container
+import page_directory
+import publish_outbox
+import rate_governor
+import render_pool
+import shared_state
 
 # configuration paths
 CONFIG_FEEDS = os.path.join("config", "rss_feeds.json")
 STATUS_FILE = os.path.join("config", "automation_status.json")
 
 POSTED_FILE = "posted_news.txt"
+OUTBOX_KIND = "grahak_news"
 FB_PAGE_ID = os.getenv("FB_PAGE_ID_GRAHAK_CHETNA") or os.getenv("GRAHAK_PAGE_ID") or os.getenv("FB_PAGE_ID")
 FB_PAGE_ACCESS_TOKEN = os.getenv("FB_PAGE_ACCESS_TOKEN")
 IG_USER_ID = os.getenv("INSTA_ID_GRAHAK_CHETNA") or os.getenv("IG_USER_ID")
@@ -41,32 +54,18 @@ TEST_MODE = os.getenv("TEST_MODE", "False").lower() in ("1","true","yes")
 
 # logging to both console and file
 logfile = os.getenv("NEWS_LOG", "news.log")
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(logfile)
-    ],
-)
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout),
+            logging.FileHandler(logfile)
+        ],
+    )
 logger = logging.getLogger(__name__)
 
 
-def _resolve_asset_path(*relative_parts: str) -> str | None:
-    """Resolve static asset path across local/codespace environments."""
-    filename = os.path.join(*relative_parts)
-    candidates = [
-        filename,
-        os.path.join(os.path.dirname(__file__), filename),
-        os.path.join("/workspace/postpilot", filename),
-        os.path.join("/workspaces/postpilot", filename),
-    ]
-    for path in candidates:
-        if os.path.exists(path):
-            return path
-    return None
-
-
 def _read_user_access_token() -> str | None:
     """Read long-lived user token from env or token.txt fallback."""
     env_token = os.getenv("FB_ACCESS_TOKEN")
@@ -85,7 +84,7 @@ def _resolve_page_access_token() -> None:
 
     Fallback chain:
     1) FB_PAGE_ACCESS_TOKEN env
-    2) token.txt/FB_ACCESS_TOKEN + Graph /me/accounts lookup by page id
+    2) token.txt/FB_ACCESS_TOKEN + cached page directory lookup by page id
     """
     global FB_PAGE_ID, FB_PAGE_ACCESS_TOKEN
 
@@ -97,49 +96,29 @@ def _resolve_page_access_token() -> None:
     if not user_token:
         return
 
-    try:
-        url = "https://graph.facebook.com/v19.0/me/accounts"
-        resp = requests.get(url, params={"access_token": user_token}, timeout=30)
-        resp.raise_for_status()
-        data = resp.json().get("data", [])
-        for page in data:
-            if page.get("id") == FB_PAGE_ID and page.get("access_token"):
-                FB_PAGE_ACCESS_TOKEN = page["access_token"]
-                return
-    except Exception as e:
-                logger.warning(
-            "unable to resolve page access token from user token (%s)",
-            type(e).__name__,
-        )
-
-
-_resolve_page_access_token()
+    # cached directory (config/page_directory.json); only hits Graph when stale
+    token = page_directory.page_token(FB_PAGE_ID, user_token)
+    if token:
+        FB_PAGE_ACCESS_TOKEN = token
+    else:
+        logger.warning("unable to resolve page access token from user token")
 
 
 def _normalize(text: str) -> str:
     return text.strip().lower()
 
 
+def _posted():
+    # opened on first use, not at import (see load_dotenv above)
+    return dedup_store.get_store(POSTED_FILE)
+
+
 def already_posted(title: str) -> bool:
-    if not os.path.exists(POSTED_FILE):
-        return False
-    norm = _normalize(title)
-    try:
-        with open(POSTED_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                if _normalize(line) == norm:
-                    return True
-    except Exception as e:
-        logger.error(f"error reading {POSTED_FILE}: {e}")
-    return False
+    return _normalize(title) in _posted()
 
 
 def mark_as_posted(title: str) -> None:
-    try:
-        with open(POSTED_FILE, "a", encoding="utf-8") as f:
-            f.write(_normalize(title) + "\n")
-    except Exception as e:
-        logger.error(f"error writing to {POSTED_FILE}: {e}")
+    _posted().add(_normalize(title))
 
 
 def load_feeds_from_config() -> list:
@@ -175,6 +154,8 @@ def save_status(status: dict) -> None:
     try:
         with open(STATUS_FILE, "w", encoding="utf-8") as f:
             json.dump(status, f, indent=2)
+        # let open dashboards know (see app.py /api/stream)
+        shared_state.publish("grahak", status)
     except Exception as e:
         logger.error(f"failed to write status: {e}")
 
@@ -204,254 +185,210 @@ def fetch_rss_news() -> list:
     return items
 
 
-def _draw_gradient(img, start, end):
-    w, h = img.size
-    for i in range(h):
-        r = int(start[0] + (end[0]-start[0]) * (i/h))
-        g = int(start[1] + (end[1]-start[1]) * (i/h))
-        b = int(start[2] + (end[2]-start[2]) * (i/h))
-        ImageDraw.Draw(img).line([(0, i),(w, i)], fill=(r,g,b))
-
-def _text_size(draw, text, font):
-    bbox = draw.textbbox((0,0), text, font=font)
-    return bbox[2]-bbox[0], bbox[3]-bbox[1]
-
-def _load_font(size: int, bold: bool = False):
-    """Load a scalable TrueType font, including Termux-friendly fallbacks."""
-    env_font = os.getenv("GRAHAK_FONT_PATH_BOLD" if bold else "GRAHAK_FONT_PATH")
-    candidates = [
-        env_font,
-        "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf" if bold else "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-        "/data/data/com.termux/files/usr/share/fonts/TTF/DejaVuSans-Bold.ttf" if bold else "/data/data/com.termux/files/usr/share/fonts/TTF/DejaVuSans.ttf",
-        "/data/data/com.termux/files/usr/share/fonts/TTF/NotoSans-Bold.ttf" if bold else "/data/data/com.termux/files/usr/share/fonts/TTF/NotoSans-Regular.ttf",
-        "arialbd.ttf" if bold else "arial.ttf",
-    ]
-    for path in candidates:
-        if not path:
-            continue
-        try:
-            return ImageFont.truetype(path, size)
-        except Exception:
-            continue
-    global _FONT_WARNING_EMITTED
-    if not _FONT_WARNING_EMITTED:
-        logger.warning("no scalable font found; using PIL default bitmap font")
-        _FONT_WARNING_EMITTED = True
-    return ImageFont.load_default()
-
-def _draw_logo_corner(img: Image.Image, draw: ImageDraw.ImageDraw, logo_path: str, width: int) -> None:
-    if not os.path.exists(logo_path):
-        return
-    logo = Image.open(logo_path).convert("RGBA")
-    diameter = int(width * 0.16)
-    logo = logo.resize((diameter, diameter), Image.Resampling.LANCZOS)
-
-    # circular crop for logo
-    mask = Image.new("L", (diameter, diameter), 0)
-    ImageDraw.Draw(mask).ellipse((0, 0, diameter, diameter), fill=255)
-    circle_logo = Image.new("RGBA", (diameter, diameter), (0, 0, 0, 0))
-    circle_logo.paste(logo, (0, 0), mask)
-
-    pad = 24
-    x = width - diameter - pad
-    y = pad
-    draw.ellipse([x - 10, y - 10, x + diameter + 10, y + diameter + 10], fill=(0, 0, 0, 170))
-    img.paste(circle_logo, (x, y), circle_logo)
-
-
-def create_news_image(title: str, source: str) -> str:
-    width, height = 1080, 1080
-    img = Image.new("RGBA", (width, height), color=(8, 8, 12, 255))
-    bg_path = _resolve_asset_path("static", "bg.png")
-    if bg_path:
-        bg = Image.open(bg_path).convert("RGBA").resize((width, height), Image.Resampling.LANCZOS)
-        img.paste(bg, (0, 0))
-    else:
-        _draw_gradient(img, (25, 25, 30), (8, 8, 12))
-    draw = ImageDraw.Draw(img, "RGBA")
-
-    top_font = _load_font(48, bold=True)
-    label_font = _load_font(52, bold=True)
-    bottom_font = _load_font(42, bold=True)
-
-    # reference-style red label
-    badge_text = "GRAHAK CHETNA"
-    badge_w, badge_h = 620, 96
-    badge_x, badge_y = (width - badge_w) // 2, 26
-    draw.rectangle([badge_x, badge_y, badge_x + badge_w, badge_y + badge_h], fill=(220, 36, 40))
-    bdw, bdh = _text_size(draw, badge_text, label_font)
-    draw.text((badge_x + (badge_w - bdw) / 2, badge_y + (badge_h - bdh) / 2 - 4), badge_text, font=label_font, fill=(255, 255, 255))
-
-    logo_path = _resolve_asset_path("static", "gclogo.jpg") or _resolve_asset_path("static", "logo.png")
-    if logo_path:
-        _draw_logo_corner(img, draw, logo_path, width)
-
-    # auto font scaling for readable title
-    max_font = 84
-    min_font = 40
-    lines = textwrap.wrap(title.strip(), width=15)[:4] or ["LATEST UPDATE"]
-
-    font = _load_font(min_font, bold=True)
-    widths, heights, total_h = [], [], 0
-    for size in range(max_font, min_font, -2):
-        test_font = _load_font(size, bold=True)
-        total_h, widths, heights = 0, [], []
-        for line in lines:
-            bbox = draw.textbbox((0,0), line, font=test_font)
-            w=bbox[2]-bbox[0]
-            h=bbox[3]-bbox[1]
-            widths.append(w)
-            heights.append(h)
-            total_h+=h+14
-
-        if total_h < height*0.38 and max(widths) < width * 0.92:
-            font=test_font
-            break
-
-    center_y = int(height*0.56)
-    y = center_y - total_h//2
-
-    for i,line in enumerate(lines):
-
-        w=widths[i]
-        h=heights[i]
-
-        x=(width-w)//2
-
-        draw.rounded_rectangle([x - 22, y - 8, x + w + 22, y + h + 10], radius=14, fill=(0, 0, 0, 120))
-        draw.text((x+3,y+3),line,font=font,fill=(0,0,0,200))
-        draw.text((x,y),line,font=font,fill=(255,255,255))
-
-        y+=h+18
-
-    # top heading
-    top_text = "News Update"
-    tw, th = _text_size(draw, top_text, top_font)
-    draw.text((44, 140), top_text, font=top_font, fill=(255, 255, 255, 220))
-
-    # bottom strip
-    bottom_strip_h = 150
-    draw.rectangle([0, height - bottom_strip_h, width, height], fill=(20, 20, 28, 230))
-    source_text = f"Courtesy: {source}"
-    ai_note = "AI note: generated with AI"
-    source_w, source_h = _text_size(draw, source_text, bottom_font)
-    note_font = _load_font(34, bold=False)
-    note_w, note_h = _text_size(draw, ai_note, note_font)
-    source_y = height - bottom_strip_h + 22
-    note_y = source_y + source_h + 10
-    draw.text(((width - source_w) / 2, source_y), source_text, font=bottom_font, fill=(255,255,255))
-    draw.text(((width - note_w) / 2, note_y), ai_note, font=note_font, fill=(228,228,228))
-
-    filename = f"temp_{uuid.uuid4().hex}.jpg"
-    img.convert("RGB").save(filename, "JPEG", quality=95)
-    return filename
-
-
-def post_to_facebook_photo(image_path: str, caption: str) -> str | None:
+def create_news_image(title: str, source: str, path: str | None = None, profile: str = "fb_feed") -> bytes:
+    """The card encoded with ``profile``; also written to ``path`` if one is given."""
+    # layout lives in cards/grahak_news.json
+    image = card_templates.render_bytes("grahak_news", profile, title=title, source=source)
+    if path:
+        with open(path, "wb") as f:
+            f.write(image)
+    return image
+
+
+def post_to_facebook_photo(image: bytes, caption: str, read_back: bool = True) -> str | None:
+    """Upload to the page -> URL of the stored image (None if FB returned none
+    or read_back is off).
+
+    Raises RuntimeError if the photo was not posted, so the outbox retries it.
+    """
     if not FB_PAGE_ID or not FB_PAGE_ACCESS_TOKEN:
-        logger.error("Facebook credentials not set")
-        return None
-    url = f"https://graph.facebook.com/{FB_PAGE_ID}/photos"
-    try:
-        with open(image_path, "rb") as f:
-            files = {"source": f}
-            data = {"caption": caption, "access_token": FB_PAGE_ACCESS_TOKEN}
-            r = requests.post(url, files=files, data=data, timeout=60)
-        r.raise_for_status()
-        res = r.json()
-        photo_id = res.get("id")
-        if not photo_id:
-            logger.error(f"no photo id returned: {res}")
-            return None
-        info = requests.get(f"https://graph.facebook.com/{photo_id}", params={"fields": "images", "access_token": FB_PAGE_ACCESS_TOKEN}, timeout=30).json()
-        images = info.get("images", [])
-        if images:
-            return images[0].get("source")
-        return None
-    except Exception as e:
-        logger.error(f"facebook photo upload failed: {e} - {r.text if 'r' in locals() else ''}")
-        return None
+        raise RuntimeError("Facebook credentials not set")
+    data = {"caption": caption, "access_token": FB_PAGE_ACCESS_TOKEN}
+    # upload the in-memory card + read back the stored image URL in one batch request
+    res, info = graph_client.upload_photo(f"{FB_PAGE_ID}/photos", ("card.jpg", image, "image/jpeg"), data,
+                                          fields="images" if read_back else None)
+    if "error" in res:
+        if res["error"].get("code") == 190:
+            # token revoked/expired: refetch the directory before the next post
+            page_directory.invalidate(_read_user_access_token())
+        raise RuntimeError(f"facebook photo upload failed: {res['error'].get('message')}")
+    if not res.get("id"):
+        raise RuntimeError(f"no photo id returned: {res}")
+    images = (info or {}).get("images", [])
+    if images:
+        return images[0].get("source")
+    return None
 
 
 def post_to_instagram_photo(image_url: str) -> bool:
     if not IG_USER_ID or not FB_PAGE_ACCESS_TOKEN:
         logger.error("Instagram credentials not set")
         return False
-    create_url = f"https://graph.facebook.com/v18.0/{IG_USER_ID}/media"
-    data = {"image_url": image_url, "caption": "", "access_token": FB_PAGE_ACCESS_TOKEN}
-    try:
-        r = requests.post(create_url, data=data, timeout=30)
-        r.raise_for_status()
-        container = r.json().get("id")
-        if not container:
-            logger.error("no container id returned for instagram")
-            return False
-        pub_url = f"https://graph.facebook.com/v18.0/{IG_USER_ID}/media_publish"
-        r2 = requests.post(pub_url, data={"creation_id": container, "access_token": FB_PAGE_ACCESS_TOKEN}, timeout=30)
-        r2.raise_for_status()
-        return True
-    except Exception as e:
-        logger.error(f"instagram photo post failed: {e} - {r.text if 'r' in locals() else ''}")
-        return False
+    return ig_container.publish_photo(IG_USER_ID, image_url, "", FB_PAGE_ACCESS_TOKEN) is not None
+
+
+def prepare_instagram_photo(image_url: str) -> str | None:
+    """Get an IG container ready without publishing it -> container id, or None."""
+    if not IG_USER_ID or not FB_PAGE_ACCESS_TOKEN:
+        logger.error("Instagram credentials not set")
+        return None
+    return ig_container.prepare_photo(IG_USER_ID, image_url, "", FB_PAGE_ACCESS_TOKEN)
+
+
+def publish_instagram_photo(container_id: str) -> bool:
+    return ig_container.publish_prepared(IG_USER_ID, container_id, FB_PAGE_ACCESS_TOKEN) is not None
+
+
+def news_caption(item: dict) -> str:
+    return (
+        "🚨 Breaking News\n\n"
+        f"{item.get('title', '')}\n\n"
+        "Read full report:\n"
+        f"{item.get('link', '')}\n\n"
+        f"Courtesy: {item.get('source', '')}\n\n"
+        "#GrahakChetna #BreakingNews #IndiaNews #Trending"
+    )
+
+
+_status_lock = threading.Lock()
+
+
+def _public_image_url(image_filename: str) -> str:
+    # the staged ig_feed encode as stored, not a re-encoded upload variant
+    return image_store.signed_url(image_filename, os.environ["STATIC_BASE_URL"], width=None)
+
+
+# outbox key -> Future of the cards rendered by this run's render_pool batch
+_prerendered = {}
+
+
+def _card_profiles() -> tuple:
+    # FB gets its own encode; IG's is only needed when it fetches from /images
+    return ("fb_feed", "ig_feed") if IG_USER_ID and image_store.direct_urls_enabled() else ("fb_feed",)
+
+
+def _card_key(item: dict) -> tuple:
+    return OUTBOX_KIND, _normalize(item["title"])
+
+
+def _render_stage(item: dict, result: dict) -> dict:
+    future = _prerendered.pop(_normalize(item["title"]), None)
+    encoded = None
+    if future:
+        try:
+            encoded = future.result()
+        except Exception as e:
+            # e.g. a broken worker pool; one inline render is cheaper than a backoff
+            logger.warning(f"pooled render failed ({e}); rendering inline")
+    if encoded is None:
+        encoded = card_templates.render_encoded("grahak_news", _card_profiles(),
+                                                title=item["title"], source=item.get("source", ""))
+    render_pool.keep(_card_key(item), encoded["fb_feed"])
+    if "ig_feed" not in encoded:
+        return {}
+    # stage a content-addressed copy IG can fetch from our /images route;
+    # removed again once IG has it (see _instagram_stage)
+    image_filename, _ = image_store.ingest(encoded["ig_feed"], derive=False)
+    return {"image_filename": image_filename}
+
+
+def _facebook_stage(item: dict, result: dict) -> dict:
+    image = render_pool.cached(_card_key(item))
+    if image is None:
+        # card not rendered in this process (e.g. restarted since the render stage)
+        image = create_news_image(item["title"], item.get("source", ""))
+    direct = "image_filename" in result
+    published = {}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        # IG fetches our own signed URL, so its container gets ready alongside
+        # the FB upload; it is only published once the upload succeeds, so a
+        # failed upload that the outbox retries never lands on IG twice
+        ig_job = None
+        if direct and IG_USER_ID and not result.get("instagram"):
+            ig_job = pool.submit(prepare_instagram_photo, _public_image_url(result["image_filename"]))
+        fb_image_url = post_to_facebook_photo(image, news_caption(item), read_back=not direct)
+        if ig_job is not None:
+            container_id = ig_job.result()
+            # if this publish fails, the instagram stage starts IG over
+            published["instagram"] = container_id is not None and publish_instagram_photo(container_id)
+    mark_as_posted(item["title"])
+    with _status_lock:
+        status = load_status()
+        status["last_news_post"] = item["title"]
+        save_status(status)
+    render_pool.forget(_card_key(item))
+    logger.info(f"posted news: {item['title']}")
+    return {"fb_image_url": fb_image_url, **published}
+
+
+def _instagram_stage(item: dict, result: dict) -> dict:
+    if IG_USER_ID and not result.get("instagram"):
+        if "image_filename" in result:
+            image_url = _public_image_url(result["image_filename"])
+        else:
+            image_url = result.get("fb_image_url")
+        if image_url:
+            if not post_to_instagram_photo(image_url):
+                raise RuntimeError("instagram publish failed")
+            result["instagram"] = True
+    if "image_filename" in result:
+        # IG has fetched its copy by now; the staged card isn't kept
+        image_store.remove(result["image_filename"])
+    return {}
+
+
+OUTBOX_STAGES = [
+    ("render", _render_stage),
+    ("facebook", _facebook_stage),
+    ("instagram", _instagram_stage),
+]
 
 
 def run():
+    publish_outbox.register(OUTBOX_KIND, OUTBOX_STAGES)
+    _resolve_page_access_token()
     status = load_status()
     status["last_news_run"] = datetime.now().astimezone().isoformat()
     save_status(status)
 
     items = fetch_rss_news()
-    posted = 0
-    last_title = ""
-    for item in items[:1] if TEST_MODE else items:
+    if TEST_MODE:
+        for item in items[:1]:
+            title = item.get("title", "")
+            create_news_image(title, item.get("source", ""))
+            logger.info(f"[TEST] would post news: {title}")
+            with open(logfile, 'a') as lf:
+                lf.write(f"[{datetime.now().astimezone().isoformat()}] TEST - NEWS - {title}\n")
+        logger.info(f"done. simulated {min(len(items), 1)} items.")
+        return
+
+    # the fetch loop only queues; rendering and publishing happen in the outbox
+    queued = []
+    for item in items:
         title = item.get("title", "")
-        link = item.get("link", "")
-        source = item.get("source", "")
-        if already_posted(title) and not TEST_MODE:
+        if not title or already_posted(title):
             continue
-        img_path = create_news_image(title, source)
-        caption = (
-            "🚨 Breaking News\n\n"
-            f"{title}\n\n"
-            "Read full report:\n"
-            f"{link}\n\n"
-            f"Courtesy: {source}\n\n"
-            "#GrahakChetna #BreakingNews #IndiaNews #Trending"
-        )
-        try:
-            if TEST_MODE:
-                logger.info(f"[TEST] would post news: {title}")
-                with open(logfile, 'a') as lf:
-                    lf.write(f"[{datetime.now().astimezone().isoformat()}] TEST - NEWS - {title}\n")
-                posted += 1
-                last_title = title
-            else:
-                fb_image_url = post_to_facebook_photo(img_path, caption)
-                if fb_image_url:
-                    try:
-                        import time
-                        time.sleep(2)
-                    except Exception:
-                        pass
-                    post_to_instagram_photo(fb_image_url)
-                mark_as_posted(title)
-                last_title = title
-                posted += 1
-        except Exception as e:
-            logger.error(f"error posting item '{title}': {e}")
-        finally:
-            try:
-                os.remove(img_path)
-            except Exception:
-                pass
-        if TEST_MODE:
-            break
-    if last_title and not TEST_MODE:
-        status = load_status()
-        status["last_news_post"] = last_title
-        save_status(status)
-    logger.info(f"done. {'simulated' if TEST_MODE else 'posted'} {posted} items.")
+        job = {"title": title, "link": item.get("link", ""), "source": item.get("source", "")}
+        if publish_outbox.enqueue(OUTBOX_KIND, _normalize(title), job):
+            queued.append(job)
+    logger.info(f"queued {len(queued)} new items.")
+
+    if rate_governor.should_defer():
+        # queued jobs persist and are published by the next run
+        logger.info(f"Graph usage high ({rate_governor.usage():.0f}%); deferring publishing")
+        return
+    # render the new cards in parallel; each job's render stage picks its card up as it finishes
+    cards = [(_normalize(job["title"]), "grahak_news", {"title": job["title"], "source": job["source"]})
+             for job in queued]
+    try:
+        with render_pool.batch(cards, _card_profiles()) as rendered:
+            _prerendered.update(rendered)
+            counts = publish_outbox.drain([OUTBOX_KIND])
+    finally:
+        # cards for jobs this run didn't reach are rendered again when they are
+        _prerendered.clear()
+    logger.info(f"done. posted {counts.get('done', 0)} items, "
+                f"{counts.get('retry', 0)} to retry, {counts.get('failed', 0)} failed.")
 
 
 if __name__ == "__main__":
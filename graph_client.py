@@ -0,0 +1,268 @@
+"""Shared Facebook Graph API client.
+
+One pooled keep-alive ``requests.Session`` for the whole process, a single
+configurable API version, per-call timeouts and retry with jittered
+exponential backoff on transient failures. Every response's usage headers
+are fed to ``rate_governor``, which paces publish calls.
+
+Usage:
+    r = graph_client.get("me/accounts", params={"access_token": token})
+    r = graph_client.post(f"{page_id}/photos", data=..., files=..., timeout=60)
+    me, pages = graph_client.batch([graph_client.call("me"),
+                                    graph_client.call("me/accounts")], token)
+
+Paths are relative to ``{GRAPH_BASE_URL}/{GRAPH_API_VERSION}``; responses are
+plain ``requests.Response`` objects.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote_plus
+
+import rate_governor
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.facebook.com").rstrip("/")
+GRAPH_API_VERSION = os.getenv("GRAPH_API_VERSION", "v19.0")
+
+DEFAULT_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", "30"))
+UPLOAD_TIMEOUT = float(os.getenv("GRAPH_UPLOAD_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "3"))
+BACKOFF_BASE = 1.0  # seconds; doubles per attempt
+BACKOFF_CAP = 30.0
+POOL_SIZE = 16
+# Graph caps a /?batch= request at 50 calls
+MAX_BATCH = 50
+
+# Graph error codes meaning "throttled / try again later"; the request was
+# rejected, so it is safe to retry even for POSTs
+THROTTLE_CODES = {4, 17, 32, 341, 368, 613, 80001, 80002, 80004}
+# transient server-side codes ("unknown"/"service") - retried for GETs only
+TRANSIENT_CODES = {1, 2}
+RETRY_STATUSES = {500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session() -> requests.Session:
+    """The process-wide pooled session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def url(path: str) -> str:
+    """Absolute, versioned Graph URL for a path like 'me/accounts'."""
+    if path.startswith(("http://", "https://")):
+        return path
+    # read per call so a GRAPH_BASE_URL from a late-loaded .env (or a local
+    # fake_graph server) is honoured by every module
+    base = os.getenv("GRAPH_BASE_URL", GRAPH_BASE_URL).rstrip("/")
+    version = os.getenv("GRAPH_API_VERSION", GRAPH_API_VERSION)
+    return f"{base}/{version}/{path.lstrip('/')}"
+
+
+def _error_code(resp: requests.Response):
+    try:
+        err = resp.json().get("error") or {}
+    except ValueError:
+        return None, False
+    return err.get("code"), bool(err.get("is_transient"))
+
+
+def _should_retry(resp: requests.Response, idempotent: bool) -> bool:
+    if resp.status_code == 429:
+        return True
+    if resp.status_code < 400:
+        return False
+    code, transient = _error_code(resp)
+    if code in THROTTLE_CODES:
+        return True
+    if not idempotent:
+        return False
+    return transient or code in TRANSIENT_CODES or resp.status_code in RETRY_STATUSES
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter keeps concurrent posting threads from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _rewind(files) -> None:
+    for value in (files or {}).values():
+        fileobj = value[1] if isinstance(value, tuple) else value
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+
+
+def request(method: str, path: str, timeout: float | None = None, retries: int | None = None,
+            **kwargs) -> requests.Response:
+    """Send a Graph request, retrying transient failures with jittered backoff.
+
+    GETs are retried on connection errors, timeouts, 5xx and transient Graph
+    errors. POSTs are not idempotent, so they are only retried when the
+    request never reached Graph or was explicitly throttled. The last
+    response is returned (or the last exception raised) once retries run out.
+    """
+    method = method.upper()
+    idempotent = method == "GET"
+    timeout = timeout or DEFAULT_TIMEOUT
+    retries = MAX_RETRIES if retries is None else retries
+    target = url(path)
+    for attempt in range(retries + 1):
+        if attempt:
+            _rewind(kwargs.get("files"))
+        try:
+            resp = session().request(method, target, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # a read timeout on a POST may have been processed; don't repeat it
+            safe = idempotent or not isinstance(e, requests.ReadTimeout)
+            if attempt >= retries or not safe:
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"graph {method} {path} failed ({type(e).__name__}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        rate_governor.observe(resp.headers)
+        if attempt < retries and _should_retry(resp, idempotent):
+            delay = _backoff(attempt)
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            logger.warning(f"graph {method} {path} -> {resp.status_code}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        return resp
+    return resp
+
+
+def get(path: str, params: dict | None = None, **kwargs) -> requests.Response:
+    return request("GET", path, params=params, **kwargs)
+
+
+def post(path: str, data: dict | None = None, files: dict | None = None, **kwargs) -> requests.Response:
+    if files and "timeout" not in kwargs:
+        kwargs["timeout"] = UPLOAD_TIMEOUT
+    return request("POST", path, data=data, files=files, **kwargs)
+
+
+def _encode(params: dict | None) -> str:
+    parts = []
+    for key, value in (params or {}).items():
+        value = str(value)
+        # JSONPath references to earlier results must reach Graph unescaped
+        if not (value.startswith("{result=") and value.endswith("}")):
+            value = quote_plus(value, safe=",")
+        parts.append(f"{quote_plus(str(key))}={value}")
+    return "&".join(parts)
+
+
+def call(path: str, params: dict | None = None, method: str = "GET", name: str | None = None,
+         **extra) -> dict:
+    """One entry of a batch request.
+
+    Give a call a ``name`` to reference its result from a later call in the
+    same batch, e.g. ``call("{result=upload:$.id}", {"fields": "images"})``.
+    For POSTs, ``params`` is sent as the call body.
+    """
+    entry = {"method": method.upper()}
+    query = _encode(params)
+    if entry["method"] == "GET":
+        entry["relative_url"] = f"{path}?{query}" if query else path
+    else:
+        entry["relative_url"] = path
+        if query:
+            entry["body"] = query
+    if name:
+        entry["name"] = name
+        # results that later calls depend on are dropped unless asked for
+        entry.setdefault("omit_response_on_success", False)
+    entry.update(extra)
+    return entry
+
+
+def _batch_result(item):
+    if item is None:
+        # a call whose dependency failed is never run
+        return None
+    try:
+        body = json.loads(item.get("body") or "null")
+    except ValueError:
+        body = None
+    code = item.get("code", 500)
+    if code >= 400 and not (isinstance(body, dict) and "error" in body):
+        body = {"error": {"message": f"HTTP {code}", "code": code}}
+    return body
+
+
+def batch(calls: list[dict], access_token: str, files: dict | None = None, **kwargs) -> list:
+    """Send independent (or dependent) calls as one /?batch= request per 50.
+
+    Returns one parsed JSON body per call, in order: an ``{"error": ...}``
+    dict for a failed call and None for one skipped because a call it
+    depends on failed. Dependencies only resolve within a chunk of 50.
+    ``files`` are attached to the first chunk (reference them with
+    ``attached_files``).
+    """
+    results = []
+    for start in range(0, len(calls), MAX_BATCH):
+        chunk = calls[start:start + MAX_BATCH]
+        data = {"access_token": access_token, "include_headers": "false", "batch": json.dumps(chunk)}
+        resp = post("", data=data, files=files if start == 0 else None, **kwargs)
+        try:
+            items = resp.json()
+        except ValueError:
+            items = {"error": {"message": f"HTTP {resp.status_code}", "code": resp.status_code}}
+        if isinstance(items, dict):
+            # the whole batch was rejected (bad token, throttled, ...)
+            results.extend([items] * len(chunk))
+        else:
+            results.extend(_batch_result(item) for item in items)
+    return results
+
+
+def upload_photo(photos_path: str, source, data: dict, fields: str | None = "images",
+                 stop_event=None) -> tuple[dict, dict | None]:
+    """Upload a photo and read back ``fields`` of it in a single round trip.
+
+    ``source`` is a file tuple/object as for ``post(files=...)`` and ``data``
+    must carry the page ``access_token``. Returns (upload response, fields of
+    the new photo or None); with ``fields=None`` it is a plain upload. If
+    ``stop_event`` is set while waiting for the publish pace, nothing is sent.
+    """
+    # a page post counts against the shared publish pace
+    if not rate_governor.acquire(stop_event=stop_event):
+        return {"error": {"message": "stopped before upload"}}, None
+    if not fields:
+        try:
+            return post(photos_path, data=data, files={"source": source}).json(), None
+        except ValueError:
+            return {"error": {"message": "upload returned no JSON"}}, None
+    data = dict(data)
+    token = data.pop("access_token")
+    calls = [
+        call(photos_path, data, method="POST", name="upload", attached_files="source"),
+        call("{result=upload:$.id}", {"fields": fields}),
+    ]
+    uploaded, info = batch(calls, token, files={"source": source})
+    if uploaded is None:
+        uploaded = {"error": {"message": "upload did not run"}}
+    if info is not None and "error" in info:
+        info = None
+    return uploaded, info
@@ -0,0 +1,176 @@
+"""Instagram media container lifecycle: create, wait until ready, publish.
+
+Instagram processes a container asynchronously after ``/{ig-user}/media``;
+publishing before its ``status_code`` reaches FINISHED fails with a 400.
+Instead of sleeping a fixed time, ``publish_photo`` polls the container with
+a short, growing interval and publishes as soon as it is ready, giving up
+straight away on ERROR/EXPIRED.
+
+Usage:
+    media_id = ig_container.publish_photo(IG_USER_ID, image_url, caption, token)
+
+``prepare_photo`` and ``publish_prepared`` split that in two, so a caller
+can get a container ready alongside other work and publish it only if that
+work succeeds (an unpublished container just expires).
+"""
+
+import os
+import time
+import logging
+
+import graph_client
+import page_directory
+import rate_governor
+
+logger = logging.getLogger(__name__)
+
+# give up on a container that isn't ready after this long
+READY_TIMEOUT = float(os.getenv("IG_CONTAINER_TIMEOUT", "60"))
+POLL_FIRST = 0.5  # seconds; most photo containers finish within a second or two
+POLL_GROWTH = 1.5
+POLL_CAP = 5.0
+
+READY = "FINISHED"
+FAILED = {"ERROR", "EXPIRED"}
+# media_publish error subcode for "media is not ready to be published"
+NOT_READY_SUBCODE = 2207027
+# invalid or expired OAuth token
+OAUTH_ERROR = 190
+
+
+class ContainerError(RuntimeError):
+    """The container failed, expired or never became ready."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def _failed(e: Exception) -> None:
+    if isinstance(e, ContainerError):
+        logger.error(f"instagram publish failed: {e}")
+        if e.code == OAUTH_ERROR:
+            # token revoked/expired: refetch the page directory on the next lookup
+            page_directory.invalidate()
+    else:
+        logger.error(f"instagram publish failed: {type(e).__name__}: {e}")
+
+
+def create(ig_user_id: str, image_url: str, caption: str, access_token: str) -> str:
+    """Create a photo container -> container id."""
+    res = graph_client.post(
+        f"{ig_user_id}/media",
+        data={"image_url": image_url, "caption": caption, "access_token": access_token},
+    ).json()
+    if "id" not in res:
+        raise ContainerError(f"container not created: {res.get('error', res)}", res.get("error", {}).get("code"))
+    return res["id"]
+
+
+def status(container_id: str, access_token: str) -> tuple[str, str]:
+    """(status_code, status detail) of a container."""
+    res = graph_client.get(
+        container_id, params={"fields": "status_code,status", "access_token": access_token}
+    ).json()
+    if "error" in res:
+        raise ContainerError(f"status check failed: {res['error'].get('message')}", res["error"].get("code"))
+    return res.get("status_code", ""), res.get("status", "")
+
+
+def wait_until_ready(container_id: str, access_token: str, timeout: float = READY_TIMEOUT,
+                     stop_event=None) -> None:
+    """Poll until the container is FINISHED; raises ContainerError otherwise,
+    including when ``stop_event`` is set while waiting."""
+    deadline = time.monotonic() + timeout
+    delay = POLL_FIRST
+    # Event.wait returns True once set; time.sleep always returns None
+    pause = stop_event.wait if stop_event is not None else time.sleep
+    while True:
+        code, detail = status(container_id, access_token)
+        if code == READY:
+            return
+        if code in FAILED:
+            raise ContainerError(f"container {container_id} {code}: {detail}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ContainerError(f"container {container_id} not ready after {timeout:.0f}s ({code or 'unknown'})")
+        if pause(min(delay, remaining)):
+            raise ContainerError(f"container {container_id} abandoned: stopped")
+        delay = min(POLL_CAP, delay * POLL_GROWTH)
+
+
+def publish(ig_user_id: str, container_id: str, access_token: str) -> str:
+    """Publish a ready container -> media id."""
+    for attempt in range(2):
+        res = graph_client.post(
+            f"{ig_user_id}/media_publish",
+            data={"creation_id": container_id, "access_token": access_token},
+        ).json()
+        if "id" in res:
+            return res["id"]
+        error = res.get("error", {})
+        # FINISHED can race the publish backend; wait once more and retry
+        if attempt == 0 and error.get("error_subcode") == NOT_READY_SUBCODE:
+            wait_until_ready(container_id, access_token)
+            continue
+        break
+    raise ContainerError(f"publish failed: {error.get('message', res)}", error.get("code"))
+
+
+def refresh_quota(ig_user_id: str, access_token: str) -> None:
+    """Record the account's 24h content-publishing usage with the rate governor."""
+    res = graph_client.get(
+        f"{ig_user_id}/content_publishing_limit",
+        params={"fields": "quota_usage,config", "access_token": access_token},
+    ).json()
+    data = (res.get("data") or [{}])[0]
+    total = (data.get("config") or {}).get("quota_total")
+    if "quota_usage" in data and total:
+        rate_governor.record_ig_quota(ig_user_id, int(data["quota_usage"]), int(total))
+
+
+def prepare_photo(ig_user_id: str, image_url: str, caption: str, access_token: str,
+                  stop_event=None) -> str | None:
+    """Create a photo container and wait until it is ready -> container id, or None on failure.
+
+    Gives up (None) if ``stop_event`` is set while waiting for the publish pace
+    or for the container.
+    """
+    try:
+        if rate_governor.ig_quota_stale(ig_user_id):
+            refresh_quota(ig_user_id, access_token)
+        if not rate_governor.ig_allowed(ig_user_id):
+            logger.warning(f"instagram publish skipped: {ig_user_id} is at its 24h publishing limit")
+            return None
+        if not rate_governor.acquire(stop_event=stop_event):
+            logger.info("instagram publish skipped: stopped")
+            return None
+        container_id = create(ig_user_id, image_url, caption, access_token)
+        wait_until_ready(container_id, access_token, stop_event=stop_event)
+        return container_id
+    except Exception as e:
+        if stop_event is not None and stop_event.is_set():
+            logger.info("instagram publish skipped: stopped")
+        else:
+            _failed(e)
+    return None
+
+
+def publish_prepared(ig_user_id: str, container_id: str, access_token: str) -> str | None:
+    """Publish a container from ``prepare_photo`` -> media id, or None on failure."""
+    try:
+        media_id = publish(ig_user_id, container_id, access_token)
+        rate_governor.ig_published(ig_user_id)
+        return media_id
+    except Exception as e:
+        _failed(e)
+    return None
+
+
+def publish_photo(ig_user_id: str, image_url: str, caption: str, access_token: str,
+                  stop_event=None) -> str | None:
+    """Create, wait for and publish a photo -> media id, or None on failure."""
+    container_id = prepare_photo(ig_user_id, image_url, caption, access_token, stop_event)
+    if container_id is None:
+        return None
+    return publish_prepared(ig_user_id, container_id, access_token)
@@ -0,0 +1,225 @@
+"""Content-addressed image library with pre-derived size variants.
+
+Uploads are stored as ``images/<sha256 prefix>.<ext>``, so the same photo
+uploaded twice is kept once and nothing is overwritten by a name clash. At
+ingest time an upload-ready JPEG (UPLOAD_WIDTH wide) and a dashboard
+thumbnail are derived into ``images/variants/``; the posting modules send the
+upload variant instead of the multi-MB original.
+
+Legacy, human-named images get their variants derived lazily on first use.
+
+``signed_url`` gives a time-limited public URL for an image's upload variant
+(or its stored bytes as-is), so Instagram can fetch it straight from /images
+instead of from Facebook.
+"""
+
+import os
+import io
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from urllib.parse import quote
+
+from PIL import Image, ImageOps
+
+import encoding_profiles
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FOLDER = "images"
+VARIANT_FOLDER = os.path.join(IMAGE_FOLDER, "variants")
+
+UPLOAD_WIDTH = 1080  # what Facebook/Instagram keep for feed photos
+THUMB_WIDTH = 320  # dashboard post grid
+# widths derived at ingest time
+INGEST_WIDTHS = (UPLOAD_WIDTH, THUMB_WIDTH)
+# widths served on demand via /images/<name>?w=; requests snap up to one of
+# these so the on-disk variant cache stays bounded
+VARIANT_WIDTHS = (160, 320, 480, 640, 800, 1080, 1440)
+
+HASH_CHARS = 20
+
+# lifetime of signed /images URLs handed to Graph (see signed_url)
+URL_TTL = 3600
+
+_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+
+class InvalidImage(ValueError):
+    """Uploaded bytes are not an image we can store."""
+
+
+def _tmp_name(path: str) -> str:
+    # unique per worker thread so concurrent derivations don't clobber each other
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def content_name(data: bytes, image_format: str) -> str:
+    return f"{hashlib.sha256(data).hexdigest()[:HASH_CHARS]}.{_EXTENSIONS[image_format]}"
+
+
+def is_content_addressed(filename: str) -> bool:
+    stem, _, ext = filename.rpartition(".")
+    return len(stem) == HASH_CHARS and ext in _EXTENSIONS.values() and all(c in "0123456789abcdef" for c in stem)
+
+
+def ingest(data: bytes, derive: bool = True) -> tuple[str, bool]:
+    """Store uploaded bytes by content hash -> (filename, was_duplicate).
+
+    ``derive=False`` skips the ingest-time variants, for images that are only
+    ever served as stored (e.g. a card staged for IG).
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            image_format = img.format
+            img.verify()
+    except Exception as e:
+        raise InvalidImage(f"not a readable image: {e}") from e
+    if image_format not in _EXTENSIONS:
+        raise InvalidImage(f"unsupported image format: {image_format}")
+
+    filename = content_name(data, image_format)
+    path = os.path.join(IMAGE_FOLDER, filename)
+    duplicate = os.path.exists(path)
+    if not duplicate:
+        os.makedirs(IMAGE_FOLDER, exist_ok=True)
+        tmp = _tmp_name(path)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    if derive:
+        for width in INGEST_WIDTHS:
+            variant_path(filename, width)
+    return filename, duplicate
+
+
+def remove(filename: str) -> None:
+    """Delete a content-addressed image and any variants derived from it."""
+    if not is_content_addressed(filename):
+        raise ValueError(f"not a content-addressed image: {filename}")
+    for path in [os.path.join(IMAGE_FOLDER, filename)] + [_variant_file(filename, w) for w in VARIANT_WIDTHS]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def snap_width(width: int) -> int:
+    """Smallest served variant width >= width (capped at the largest)."""
+    for w in VARIANT_WIDTHS:
+        if w >= width:
+            return w
+    return VARIANT_WIDTHS[-1]
+
+
+def _variant_file(filename: str, width: int) -> str:
+    # keep the source extension: foo.png and foo.jpg are different images
+    return os.path.join(VARIANT_FOLDER, f"{filename}_w{width}.jpg")
+
+
+def _variant_profile(width: int) -> str:
+    # the upload variant is what page uploads (and signed IG URLs) send
+    if width == UPLOAD_WIDTH:
+        return "fb_feed"
+    return "preview" if width <= THUMB_WIDTH else "web"
+
+
+def _render_variant(src: str, dest: str, width: int) -> None:
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            flat = Image.new("RGB", img.size, (255, 255, 255))
+            flat.paste(img, mask=img.getchannel("A"))
+            img = flat
+        else:
+            img = img.convert("RGB")
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.Resampling.LANCZOS)
+        os.makedirs(VARIANT_FOLDER, exist_ok=True)
+        tmp = _tmp_name(dest)
+        encoding_profiles.save(img, tmp, _variant_profile(width))
+        os.replace(tmp, dest)
+
+
+def variant_path(filename: str, width: int) -> str | None:
+    """Path of a JPEG at most `width` px wide, deriving it if needed.
+
+    Returns None if the source image is missing or can't be decoded.
+    """
+    src = os.path.join(IMAGE_FOLDER, filename)
+    dest = _variant_file(filename, width)
+    try:
+        src_mtime = os.path.getmtime(src)
+    except OSError:
+        return None
+    try:
+        # content-addressed sources never change; legacy ones might
+        if os.path.exists(dest) and (is_content_addressed(filename) or os.path.getmtime(dest) >= src_mtime):
+            return dest
+        _render_variant(src, dest, width)
+        return dest
+    except Exception as e:
+        logger.warning(f"could not derive {width}px variant of {filename}: {e}")
+        return None
+
+
+def upload_path(filename: str) -> str:
+    """Best file to send to Facebook for a library image (falls back to the original)."""
+    original = os.path.join(IMAGE_FOLDER, filename)
+    variant = variant_path(filename, UPLOAD_WIDTH)
+    if variant is None:
+        return original
+    # an already small JPEG can come out larger after re-encoding
+    if filename.lower().endswith((".jpg", ".jpeg")) and os.path.getsize(original) <= os.path.getsize(variant):
+        return original
+    return variant
+
+
+def _url_secret() -> str:
+    # read at call time: the Grahak scripts load .env after importing us
+    return os.getenv("IMAGE_URL_SECRET", "")
+
+
+def signing_enabled() -> bool:
+    """A URL secret is set: /images serves Graph-facing forms only on a valid signature."""
+    return bool(_url_secret())
+
+
+def requires_signature(width: int | None) -> bool:
+    """/images?w=<width> (None: the stored image) must carry a valid signature."""
+    # only the forms handed to Graph; anything snapping to the upload width is
+    # the same file as the signed variant
+    return signing_enabled() and (not width or snap_width(width) == UPLOAD_WIDTH)
+
+
+def direct_urls_enabled() -> bool:
+    """IG may be fed signed /images URLs (IG_DIRECT_URLS + a secret + a public base URL)."""
+    enabled = os.getenv("IG_DIRECT_URLS", "").lower() in ("1", "true", "yes")
+    return enabled and bool(_url_secret()) and bool(os.getenv("STATIC_BASE_URL"))
+
+
+def _signature(filename: str, width: int, expires: int) -> str:
+    msg = f"{filename}:{width}:{expires}".encode()
+    return hmac.new(_url_secret().encode(), msg, hashlib.sha256).hexdigest()[:32]
+
+
+def signed_url(filename: str, base_url: str, width: int | None = UPLOAD_WIDTH, ttl: int | None = None) -> str:
+    """Expiring URL of a JPEG variant, served by /images/<filename>.
+
+    ``width=None`` signs the stored image itself, served byte for byte.
+    """
+    ttl = ttl or int(os.getenv("IMAGE_URL_TTL", URL_TTL))
+    expires = int(time.time()) + ttl
+    # the original is signed as width 0, which is what /images checks it against
+    sig = _signature(filename, width or 0, expires)
+    variant = f"w={width}&" if width else ""
+    return f"{base_url.rstrip('/')}/images/{quote(filename)}?{variant}exp={expires}&sig={sig}"
+
+
+def verify_signature(filename: str, width: int, expires: int, sig: str) -> bool:
+    if not _url_secret() or expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(filename, width, expires), sig)
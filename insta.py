@@ -1,6 +1,10 @@
 # insta_thread.py
-import requests, time, json, os
+import os
 from threading import Event
+import dedup_store
+import graph_client
+import ig_container
+import page_directory
 
 stop_event = Event()
 status_callback = None
@@ -35,13 +39,40 @@ def set_interval(interval):
     global current_interval
     current_interval = interval
 
-def get_recent_facebook_posts():
-    page_id = FB_PAGE_ID
+POST_FIELDS = 'id,message,attachments{media,type}'
+
+def get_recent_facebook_posts(page_id=None):
+    page_id = page_id or FB_PAGE_ID
     if not page_id and FB_PAGE_NAME:
         page_id = resolve_page_id(FB_PAGE_NAME)
 
-    url = f"https://graph.facebook.com/v18.0/{page_id}/posts?fields=id,message,attachments{{media,type}}&access_token={FB_ACCESS_TOKEN}"
-    return requests.get(url).json().get('data', [])
+    params = {'fields': POST_FIELDS, 'access_token': FB_ACCESS_TOKEN}
+    return _check_oauth(graph_client.get(f"{page_id}/posts", params=params).json()).get('data', [])
+
+
+def _check_oauth(res):
+    """Pass a Graph response through, dropping the cached page directory if the token was rejected."""
+    if ((res or {}).get('error') or {}).get('code') == 190:
+        # token revoked/expired: refetch the directory on the next lookup
+        page_directory.invalidate(FB_ACCESS_TOKEN)
+    return res
+
+
+def fetch_sync_inputs(page_id):
+    """(IG user id, recent FB posts) for one sync cycle in a single round trip.
+
+    The IG id normally comes from the page directory cache; when it doesn't,
+    the page lookup and the posts fetch go out as one batch request.
+    """
+    ig_id = page_directory.ig_account(page_id, FB_ACCESS_TOKEN) if FB_ACCESS_TOKEN else None
+    if ig_id or not FB_ACCESS_TOKEN:
+        return ig_id or IG_USER_ID, get_recent_facebook_posts(page_id)
+    page, posts = graph_client.batch([
+        graph_client.call(page_id, {'fields': 'instagram_business_account'}),
+        graph_client.call(f"{page_id}/posts", {'fields': POST_FIELDS}),
+    ], FB_ACCESS_TOKEN)
+    ig = (_check_oauth(page) or {}).get('instagram_business_account') or {}
+    return ig.get('id') or IG_USER_ID, (posts or {}).get('data', [])
 
 
 def resolve_page_id(page_name):
@@ -49,7 +80,7 @@ def resolve_page_id(page_name):
     if not FB_ACCESS_TOKEN:
         return FB_PAGE_ID
     try:
-        q = requests.get(f"https://graph.facebook.com/v18.0/search?type=page&q={requests.utils.quote(page_name)}&access_token={FB_ACCESS_TOKEN}").json()
+        q = graph_client.get("search", params={'type': 'page', 'q': page_name, 'access_token': FB_ACCESS_TOKEN}).json()
         data = q.get('data', [])
         if not data:
             return FB_PAGE_ID
@@ -66,8 +97,11 @@ def resolve_instagram_user_id_from_page(page_id):
     """Get the connected Instagram Business account id from a Facebook Page."""
     if not FB_ACCESS_TOKEN or not page_id:
         return IG_USER_ID
+    ig_id = page_directory.ig_account(page_id, FB_ACCESS_TOKEN)
+    if ig_id:
+        return ig_id
     try:
-        r = requests.get(f"https://graph.facebook.com/v18.0/{page_id}?fields=instagram_business_account&access_token={FB_ACCESS_TOKEN}").json()
+        r = graph_client.get(page_id, params={'fields': 'instagram_business_account', 'access_token': FB_ACCESS_TOKEN}).json()
         ig = r.get('instagram_business_account')
         if ig and 'id' in ig:
             return ig['id']
@@ -76,27 +110,23 @@ def resolve_instagram_user_id_from_page(page_id):
     return IG_USER_ID
 
 def get_posted_ids():
-    try:
-        with open(POSTED_FILE, 'r') as f:
-            return set(f.read().splitlines())
-    except FileNotFoundError:
-        return set()
+    """Shared dedup store of synced post ids (supports ``in``)."""
+    return dedup_store.get_store(POSTED_FILE)
 
 def save_posted_id(post_id):
-    with open(POSTED_FILE, 'a') as f:
-        f.write(post_id + '\n')
+    get_posted_ids().add(post_id)
 
-def post_to_instagram(image_url, caption):
-    create_url = f"https://graph.facebook.com/v18.0/{IG_USER_ID}/media"
-    publish_url = f"https://graph.facebook.com/v18.0/{IG_USER_ID}/media_publish"
+def post_to_instagram(image_url, caption, stop_event=None):
+    # publishes as soon as the container is FINISHED (no fixed sleep); a set
+    # stop_event abandons the wait for the publish pace
+    return ig_container.publish_photo(IG_USER_ID, image_url, caption, FB_ACCESS_TOKEN, stop_event) is not None
 
-    payload = {'image_url': image_url, 'caption': caption, 'access_token': FB_ACCESS_TOKEN}
-    res = requests.post(create_url, data=payload).json()
-    if 'id' not in res:
-        return False
+def prepare_instagram(image_url, caption, stop_event=None):
+    """Ready-to-publish container id for a post (None on failure); publish with publish_prepared."""
+    return ig_container.prepare_photo(IG_USER_ID, image_url, caption, FB_ACCESS_TOKEN, stop_event)
 
-    time.sleep(5)
-    return 'id' in requests.post(publish_url, data={'creation_id': res['id'], 'access_token': FB_ACCESS_TOKEN}).json()
+def publish_prepared(container_id):
+    return ig_container.publish_prepared(IG_USER_ID, container_id, FB_ACCESS_TOKEN) is not None
 
 def run_insta_sync():
     post_count = 0
@@ -106,9 +136,7 @@ def run_insta_sync():
             page_id = FB_PAGE_ID or (FB_PAGE_NAME and resolve_page_id(FB_PAGE_NAME))
             # resolve IG user id from page if possible
             global IG_USER_ID
-            IG_USER_ID = resolve_instagram_user_id_from_page(page_id)
-
-            posts = get_recent_facebook_posts()
+            IG_USER_ID, posts = fetch_sync_inputs(page_id)
             posted_ids = get_posted_ids()
 
             for post in posts:
@@ -122,7 +150,7 @@ def run_insta_sync():
                     continue
 
                 image_url = media.get('image', {}).get('src')
-                if image_url and post_to_instagram(image_url, post.get('message', '')):
+                if image_url and post_to_instagram(image_url, post.get('message', ''), stop_event):
                     post_count += 1
                     current_post_summary = f"{post.get('message', '')[:50]}..." if len(post.get('message', '')) > 50 else post.get('message', 'No message')
                     if status_callback:
@@ -131,10 +159,10 @@ def run_insta_sync():
 
             if status_callback:
                 status_callback('insta', True, 'Checking...', None)
-            time.sleep(current_interval)
+            stop_event.wait(current_interval)
         except Exception as e:
             print("Error in Insta sync:", e)
-            time.sleep(60)
+            stop_event.wait(60)
 
 def stop_insta_sync():
     stop_event.set()
@@ -0,0 +1,63 @@
+"""Log readers whose cost doesn't grow with the size of the log file.
+
+``tail`` reads fixed-size blocks backwards from the end until it has the
+last N lines, and ``read_since`` returns only the complete lines appended
+after a byte offset. Both return the offset to resume from, so clients can
+poll for "lines since offset X".
+"""
+
+import os
+
+BLOCK_SIZE = 8192
+
+
+def _decode(data: bytes) -> list[str]:
+    return data.decode("utf-8", errors="replace").splitlines()
+
+
+def tail(path: str, n: int = 50, block_size: int = BLOCK_SIZE) -> tuple[list[str], int]:
+    """Last n complete lines of path -> (lines, end offset)."""
+    if n <= 0:
+        return [], 0
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return [], 0
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        # ignore a partially written last line; it'll be picked up by read_since
+        pos = end
+        data = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+            # n+1 newlines guarantee n whole lines before the last newline
+            if data.count(b"\n") > n:
+                break
+        cut = data.rfind(b"\n") + 1
+        offset = end - (len(data) - cut)
+        return _decode(data[:cut])[-n:], offset
+
+
+def read_since(path: str, offset: int, n: int = 50, max_bytes: int = 256 * 1024) -> tuple[list[str], int]:
+    """Complete lines appended after offset -> (lines, new offset).
+
+    If the offset is invalid (negative, or past the end because the file was
+    truncated or replaced) or the gap is larger than max_bytes, fall back to
+    the last n lines.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return [], 0
+    if offset < 0 or offset > size or size - offset > max_bytes:
+        return tail(path, n)
+    if offset == size:
+        return [], offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    cut = data.rfind(b"\n") + 1
+    return _decode(data[:cut]), offset + cut
@@ -1,7 +1,12 @@
 # nz_thread.py
-import requests, time, random, os, json
+import random, os
 from threading import Event
+from concurrent.futures import ThreadPoolExecutor
 import insta
+import post_store
+import image_store
+import graph_client
+import page_directory
 
 stop_event = Event()
 status_callback = None
@@ -22,25 +27,18 @@ def _read_token_file():
 ACCESS_TOKEN = get_access_token()
 PAGE_ID = os.getenv('FB_PAGE_ID_NEXORA_BY_PHOENIX_INTERNATIONAL') or os.getenv('FB_PAGE_ID_NEXORA_BY_PHOENIX') or '954901604381882'  # Nexora by Phoenix International page
 IMAGE_FOLDER = "images"
-FB_API_URL = f"https://graph.facebook.com/v19.0/{PAGE_ID}/photos"
-POSTS_FILE = "posts/visa_posts.json"
+FB_PHOTOS_PATH = f"{PAGE_ID}/photos"  # relative to graph_client base/version
+POST_TYPE = 'nz'  # library in post_store
 
 def get_page_token():
-    """Fetch page token from user token"""
-    try:
-        url = f"https://graph.facebook.com/v19.0/me/accounts?access_token={ACCESS_TOKEN}"
-        res = requests.get(url).json()
-        if 'data' in res:
-            for page in res['data']:
-                if page.get('id') == PAGE_ID:
-                    return page.get('access_token')
-        return None
-    except:
-        return None
+    """Page token from the cached page directory (no per-post /me/accounts call)"""
+    return page_directory.page_token(PAGE_ID, ACCESS_TOKEN)
 
-def load_posts():
-    with open(POSTS_FILE, 'r') as f:
-        return json.load(f)
+def load_post_ids():
+    """Shuffled rotation of post ids; posts themselves are read one at a time."""
+    ids = post_store.list_ids(POST_TYPE)
+    random.shuffle(ids)
+    return ids
 
 
 def get_static_base_url():
@@ -49,7 +47,8 @@ def get_static_base_url():
 
 
 def get_image_url(filename):
-    return f"{get_static_base_url()}/images/{filename}"
+    """Signed, expiring URL of the image's upload variant on our /images route."""
+    return image_store.signed_url(filename, get_static_base_url())
 
 def set_status_callback(callback):
     """Set callback for status updates"""
@@ -74,32 +73,49 @@ def post_on_facebook(message, image_filename):
             print("❌ Failed: Could not get page token")
             return False
 
-        with open(path, 'rb') as img:
-            files = {'source': (image_filename, img, 'image/jpeg')}
-            data = {"caption": message, "access_token": page_token}
-            res = requests.post(FB_API_URL, files=files, data=data).json()
-
-        if 'error' in res:
-            error_msg = res['error'].get('message', 'Unknown error')
-            print(f"❌ Failed: {error_msg}")
-            return False
-
-        photo_id = res.get('id')
-        image_url = None
-        if photo_id:
-            info = requests.get(f"https://graph.facebook.com/v19.0/{photo_id}?fields=images&access_token={page_token}").json()
-            images = info.get('images') or []
+        # with IG_DIRECT_URLS, Instagram fetches the image from our own /images
+        # route and its container gets ready alongside the FB upload; it is
+        # only published once the upload succeeds, so a failed post that the
+        # rotation retries never lands on Instagram twice
+        direct = image_store.direct_urls_enabled()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            ig_job = pool.submit(insta.prepare_instagram, get_image_url(image_filename), message, stop_event) if direct else None
+
+            # send the pre-derived 1080px JPEG rather than the full-size original
+            with open(image_store.upload_path(image_filename), 'rb') as img:
+                files = {'source': (image_filename, img, 'image/jpeg')}
+                data = {"caption": message, "access_token": page_token}
+                # upload (+ read back the stored image URL, unless IG doesn't need it)
+                res, info = graph_client.upload_photo(FB_PHOTOS_PATH, files['source'], data,
+                                                      fields=None if direct else "images",
+                                                      stop_event=stop_event)
+
+            if 'error' in res:
+                error_msg = res['error'].get('message', 'Unknown error')
+                print(f"❌ Failed: {error_msg}")
+                if res['error'].get('code') == 190:
+                    # token revoked/expired: refetch the directory before the next post
+                    page_directory.invalidate(ACCESS_TOKEN)
+                return False
+
+            photo_id = res.get('id')
+            image_url = None
+            images = (info or {}).get('images') or []
             if images:
                 image_url = images[0].get('source')
 
-        print("✅ Posted:", res)
+            print("✅ Posted:", res)
 
-        # Cross-post to Instagram using the Facebook image URL if available
-        if image_url:
-            try:
-                insta.post_to_instagram(image_url, message)
-            except Exception:
-                pass
+            # Cross-post to Instagram using the Facebook image URL if available
+            if image_url and not direct:
+                try:
+                    insta.post_to_instagram(image_url, message, stop_event)
+                except Exception:
+                    pass
+            if ig_job:
+                container_id = ig_job.result()
+                if not (container_id and insta.publish_prepared(container_id)):
+                    print("⚠️ Instagram cross-post failed")
 
         return {"photo_id": photo_id, "image_url": image_url, "response": res}
     except Exception as e:
@@ -108,13 +124,18 @@ def post_on_facebook(message, image_filename):
 
 def run_nexora_by_phoenix():
     """Run Nexora by Phoenix International posting"""
-    posts = load_posts()
-    random.shuffle(posts)
     post_count = 0
     while not stop_event.is_set():
-        for post in posts:
+        post_ids = load_post_ids()
+        if not post_ids:
+            stop_event.wait(current_interval)
+        for post_id in post_ids:
             if stop_event.is_set():
                 break
+            # re-read so dashboard edits/deletes since the rotation started apply
+            post = post_store.get_post(POST_TYPE, post_id)
+            if post is None:
+                continue
             post_count += 1
             current_post_summary = f"{post['message'][:50]}..." if len(post.get('message', '')) > 50 else post.get('message', 'No message')
             if status_callback:
@@ -123,7 +144,7 @@ def run_nexora_by_phoenix():
             if status_callback:
                 status = "Posted" if success else "Failed"
                 status_callback('nexora_by_phoenix', True, status, None)
-            time.sleep(current_interval)
+            stop_event.wait(current_interval)
 
 def stop_nexora_by_phoenix():
     """Stop Nexora by Phoenix International posting"""
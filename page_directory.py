@@ -0,0 +1,211 @@
+"""Cached directory of managed pages: page id -> page token + linked IG account.
+
+Replaces the /me/accounts round trip that used to precede every post. One
+``me/accounts`` call (with ``instagram_business_account`` expanded) fills the
+directory; it is kept in memory, persisted to config/page_directory.json so
+the Grahak script subprocesses start warm, and refreshed in the background
+before it expires. Expiry is the earlier of PAGE_DIRECTORY_TTL and the user
+token's own expiry.
+
+Usage:
+    token = page_directory.page_token(PAGE_ID, user_token)
+    ig_id = page_directory.ig_account(PAGE_ID, user_token)
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+import graph_client
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = os.getenv("PAGE_DIRECTORY_FILE", os.path.join("config", "page_directory.json"))
+TTL = float(os.getenv("PAGE_DIRECTORY_TTL", str(6 * 3600)))
+# refresh in the background once this close to expiry
+REFRESH_AHEAD = 0.2
+# re-check for a refresh this often in the background thread
+REFRESH_POLL = 60
+# give up on a token this long before Graph says it expires
+EXPIRY_MARGIN = 3600
+# after a failed refresh, keep serving what we have for this long
+RETRY_AFTER = 60
+
+_lock = threading.Lock()
+_directories = {}  # token fingerprint -> {'fetched_at', 'expires_at', 'pages'}
+_tokens = {}  # token fingerprint -> user token (kept in memory only)
+_failed_at = {}  # token fingerprint -> time of the last failed refresh
+_refresher = None
+
+
+def _fingerprint(user_token: str) -> str:
+    return hashlib.sha256(user_token.encode()).hexdigest()[:16]
+
+
+def default_token():
+    """User token from FB_ACCESS_TOKEN / FB_TOKEN / token.txt."""
+    token = os.getenv("FB_ACCESS_TOKEN") or os.getenv("FB_TOKEN")
+    if token:
+        return token.strip()
+    try:
+        with open("token.txt", "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _load_file() -> dict:
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_file() -> None:
+    data = _load_file()
+    data.update(_directories)
+    os.makedirs(os.path.dirname(CACHE_FILE) or ".", exist_ok=True)
+    tmp = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        # holds page tokens: private from the moment it exists, not after the replace
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(fd, 0o600)  # in case a stale tmp file was left with wider permissions
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, CACHE_FILE)
+    except OSError as e:
+        logger.warning(f"could not persist page directory: {e}")
+
+
+def _token_expiry(user_token: str) -> float | None:
+    """Epoch seconds the user token expires at, or None if it doesn't/unknown."""
+    try:
+        data = graph_client.get(
+            "debug_token", params={"input_token": user_token, "access_token": user_token}
+        ).json().get("data", {})
+    except Exception:
+        return None
+    expires = data.get("expires_at") or 0
+    return float(expires) if expires else None
+
+
+def _fetch(user_token: str) -> dict:
+    """One directory refresh: me/accounts (paged) + the user token's expiry."""
+    pages = {}
+    path = "me/accounts"
+    params = {
+        "fields": "id,name,access_token,instagram_business_account",
+        "limit": 100,
+        "access_token": user_token,
+    }
+    while path:
+        res = graph_client.get(path, params=params).json()
+        if "error" in res:
+            raise RuntimeError(res["error"].get("message", "me/accounts failed"))
+        for page in res.get("data", []):
+            pages[page["id"]] = {
+                "name": page.get("name", ""),
+                "access_token": page.get("access_token"),
+                "ig_id": (page.get("instagram_business_account") or {}).get("id"),
+            }
+        # paging.next already carries the query string
+        path, params = res.get("paging", {}).get("next"), None
+    now = time.time()
+    expires_at = now + TTL
+    token_expiry = _token_expiry(user_token)
+    if token_expiry:
+        expires_at = min(expires_at, token_expiry - EXPIRY_MARGIN)
+    return {"fetched_at": now, "expires_at": expires_at, "pages": pages}
+
+
+def refresh(user_token: str | None = None) -> dict | None:
+    """Fetch the directory now; keeps the old one if the fetch fails."""
+    user_token = user_token or default_token()
+    if not user_token:
+        return None
+    fp = _fingerprint(user_token)
+    try:
+        entry = _fetch(user_token)
+    except Exception as e:
+        logger.warning(f"page directory refresh failed ({type(e).__name__}: {e})")
+        with _lock:
+            _failed_at[fp] = time.time()
+        return _directories.get(fp)
+    with _lock:
+        _directories[fp] = entry
+        _tokens[fp] = user_token
+        _failed_at.pop(fp, None)
+        _save_file()
+    return entry
+
+
+def invalidate(user_token: str | None = None) -> None:
+    """Force the next lookup to refetch (e.g. after an OAuth error)."""
+    user_token = user_token or default_token()
+    if not user_token:
+        return
+    with _lock:
+        entry = _directories.get(_fingerprint(user_token))
+        if entry:
+            entry["expires_at"] = 0
+
+
+def _refresh_loop() -> None:
+    while True:
+        time.sleep(REFRESH_POLL)
+        now = time.time()
+        for fp, entry in list(_directories.items()):
+            token = _tokens.get(fp)
+            if not token:
+                continue
+            lifetime = entry["expires_at"] - entry["fetched_at"]
+            if now >= entry["expires_at"] - lifetime * REFRESH_AHEAD:
+                refresh(token)
+
+
+def _ensure_refresher() -> None:
+    global _refresher
+    with _lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, daemon=True)
+            _refresher.start()
+
+
+def _directory(user_token: str | None) -> dict:
+    user_token = user_token or default_token()
+    if not user_token:
+        return {}
+    fp = _fingerprint(user_token)
+    entry = _directories.get(fp)
+    if entry is None:
+        # warm start from disk (written by this or another process)
+        entry = _load_file().get(fp)
+        if entry:
+            with _lock:
+                _directories[fp] = entry
+                _tokens[fp] = user_token
+    now = time.time()
+    if (entry is None or now >= entry["expires_at"]) and now - _failed_at.get(fp, 0) >= RETRY_AFTER:
+        entry = refresh(user_token) or entry
+    else:
+        _tokens[fp] = user_token
+    _ensure_refresher()
+    return (entry or {}).get("pages", {})
+
+
+def pages(user_token: str | None = None) -> dict:
+    """{page_id: {'name', 'access_token', 'ig_id'}} for every managed page."""
+    return _directory(user_token)
+
+
+def page_token(page_id: str, user_token: str | None = None) -> str | None:
+    return (_directory(user_token).get(str(page_id)) or {}).get("access_token")
+
+
+def ig_account(page_id: str, user_token: str | None = None) -> str | None:
+    """Instagram business account id linked to a page, if any."""
+    return (_directory(user_token).get(str(page_id)) or {}).get("ig_id")
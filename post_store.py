@@ -0,0 +1,241 @@
+"""SQLite-backed post library shared by app.py and the posting modules.
+
+Each post gets a stable integer id, single-record edits are O(1) row
+updates instead of whole-file JSON rewrites, and readers can page through a
+library incrementally. The legacy posts/*.json files are imported the first
+time a library is opened.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+POSTS_DIR = "posts"
+DB_PATH = os.getenv("POSTS_DB", os.path.join(POSTS_DIR, "posts.db"))
+
+# post type -> legacy JSON file imported on first use
+LEGACY_FILES = {
+    'tour': os.path.join(POSTS_DIR, "tour_posts.json"),
+    'nz': os.path.join(POSTS_DIR, "visa_posts.json"),
+    'insta': os.path.join(POSTS_DIR, "insta_posts.json"),
+    'grahakchetna': os.path.join(POSTS_DIR, "grahakchetna_posts.json"),
+}
+
+FIELDS = ('message', 'image_filename')
+
+_local = threading.local()
+_migrated = set()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_type TEXT NOT NULL,
+    message TEXT NOT NULL DEFAULT '',
+    image_filename TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_type_id ON posts (post_type, id);
+CREATE TABLE IF NOT EXISTS libraries (
+    post_type TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    migrated INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _row_to_post(row):
+    return {'id': row['id'], 'message': row['message'], 'image_filename': row['image_filename']}
+
+
+def _bump_version(conn, post_type):
+    conn.execute(
+        "INSERT INTO libraries (post_type, version) VALUES (?, 1) "
+        "ON CONFLICT(post_type) DO UPDATE SET version = version + 1",
+        (post_type,),
+    )
+
+
+@contextmanager
+def _write(post_type):
+    """Write transaction on one library; bumps its version on commit."""
+    conn = _open(post_type)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    _bump_version(conn, post_type)
+    conn.execute("COMMIT")
+
+
+def _open(post_type):
+    """Return a connection, importing the legacy JSON library once."""
+    conn = _connect()
+    if post_type in _migrated:
+        return conn
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT migrated FROM libraries WHERE post_type = ?", (post_type,)).fetchone()
+        if not row or not row['migrated']:
+            legacy = []
+            try:
+                with open(LEGACY_FILES.get(post_type, ''), 'r') as f:
+                    legacy = json.load(f)
+            except (OSError, ValueError):
+                pass
+            now = time.time()
+            conn.executemany(
+                "INSERT INTO posts (post_type, message, image_filename, updated_at) VALUES (?, ?, ?, ?)",
+                [(post_type, p.get('message', ''), p.get('image_filename', ''), now) for p in legacy],
+            )
+            conn.execute(
+                "INSERT INTO libraries (post_type, version, migrated) VALUES (?, 1, 1) "
+                "ON CONFLICT(post_type) DO UPDATE SET migrated = 1, version = version + 1",
+                (post_type,),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    _migrated.add(post_type)
+    return conn
+
+
+def list_posts(post_type):
+    """All posts of a type, in insertion order."""
+    rows = _open(post_type).execute(
+        "SELECT id, message, image_filename FROM posts WHERE post_type = ? ORDER BY id", (post_type,)
+    )
+    return [_row_to_post(r) for r in rows]
+
+
+def iter_posts(post_type, batch_size=200):
+    """Yield posts a page at a time using an id cursor (never loads the whole library)."""
+    conn = _open(post_type)
+    after = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, message, image_filename FROM posts WHERE post_type = ? AND id > ? ORDER BY id LIMIT ?",
+            (post_type, after, batch_size),
+        ).fetchall()
+        if not rows:
+            return
+        for r in rows:
+            yield _row_to_post(r)
+        after = rows[-1]['id']
+
+
+def query_posts(post_type, after=0, limit=None, q=None):
+    """One page of posts with id > after, optionally filtered on message.
+
+    Returns (posts, next_cursor); next_cursor is None on the last page.
+    """
+    sql = "SELECT id, message, image_filename FROM posts WHERE post_type = ? AND id > ?"
+    params = [post_type, after]
+    if q:
+        escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        sql += " AND message LIKE ? ESCAPE '\\'"
+        params.append(f"%{escaped}%")
+    sql += " ORDER BY id"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+    rows = _open(post_type).execute(sql, params).fetchall()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]['id']
+    return [_row_to_post(r) for r in rows], next_cursor
+
+
+def get_version(post_type):
+    """Counter bumped on every write to a library (used for ETags)."""
+    row = _open(post_type).execute("SELECT version FROM libraries WHERE post_type = ?", (post_type,)).fetchone()
+    return row['version'] if row else 0
+
+
+def list_ids(post_type):
+    """Ids of all posts of a type (cheap; used to build a rotation)."""
+    rows = _open(post_type).execute("SELECT id FROM posts WHERE post_type = ? ORDER BY id", (post_type,))
+    return [r['id'] for r in rows]
+
+
+def get_post(post_type, post_id):
+    row = _open(post_type).execute(
+        "SELECT id, message, image_filename FROM posts WHERE post_type = ? AND id = ?", (post_type, post_id)
+    ).fetchone()
+    return _row_to_post(row) if row else None
+
+
+def add_post(post_type, message='', image_filename=''):
+    with _write(post_type) as conn:
+        cur = conn.execute(
+            "INSERT INTO posts (post_type, message, image_filename, updated_at) VALUES (?, ?, ?, ?)",
+            (post_type, message, image_filename, time.time()),
+        )
+        post_id = cur.lastrowid
+    return {'id': post_id, 'message': message, 'image_filename': image_filename}
+
+
+def update_post(post_type, post_id, **fields):
+    """Update the given fields of one post; returns the new post or None if missing."""
+    fields = {k: v for k, v in fields.items() if k in FIELDS and v is not None}
+    with _write(post_type) as conn:
+        if fields:
+            assignments = ", ".join(f"{k} = ?" for k in fields)
+            conn.execute(
+                f"UPDATE posts SET {assignments}, updated_at = ? WHERE post_type = ? AND id = ?",
+                (*fields.values(), time.time(), post_type, post_id),
+            )
+        row = conn.execute(
+            "SELECT id, message, image_filename FROM posts WHERE post_type = ? AND id = ?", (post_type, post_id)
+        ).fetchone()
+    return _row_to_post(row) if row else None
+
+
+def delete_post(post_type, post_id):
+    """Delete one post; returns False if it did not exist."""
+    with _write(post_type) as conn:
+        cur = conn.execute("DELETE FROM posts WHERE post_type = ? AND id = ?", (post_type, post_id))
+    return cur.rowcount > 0
+
+
+def import_posts(post_type, posts, replace=False):
+    """Insert an iterable of post dicts in one transaction; returns the count.
+
+    The iterable is consumed lazily, so callers can stream it. If it raises,
+    nothing is written. With replace=True the library is emptied first.
+    """
+    count = 0
+    with _write(post_type) as conn:
+        if replace:
+            conn.execute("DELETE FROM posts WHERE post_type = ?", (post_type,))
+        now = time.time()
+
+        def rows():
+            nonlocal count
+            for p in posts:
+                count += 1
+                yield (post_type, p.get('message', ''), p.get('image_filename', ''), now)
+
+        conn.executemany(
+            "INSERT INTO posts (post_type, message, image_filename, updated_at) VALUES (?, ?, ?, ?)", rows()
+        )
+    return count
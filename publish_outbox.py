@@ -0,0 +1,268 @@
+"""Durable outbox of publish jobs (SQLite, WAL mode).
+
+Producers (the Grahak feed runs) only ``enqueue`` a job per item; a pool of
+workers then takes each job through its stages - e.g. render -> facebook ->
+instagram - recording progress after every stage. A failed stage is retried
+with exponential backoff from where it stopped, so an IG failure never
+re-posts to Facebook, and jobs left behind by a crash or restart are picked
+up by the next ``drain``.
+
+Usage:
+    publish_outbox.register('news', [('render', render), ('facebook', fb), ...])
+    publish_outbox.enqueue('news', title, {'title': title, ...})
+    publish_outbox.drain(['news'])
+
+A stage function takes ``(payload, result)`` and returns a dict merged into
+``result``; raising retries the stage later, ``PermanentError`` fails the
+job immediately. A failed job stays failed: queueing its key again only
+puts it back in line (from the stage it failed at, attempts kept) once it
+has sat failed for OUTBOX_REQUEUE_HOURS, and ``requeue`` retries it at once
+on an operator's request. Finished jobs are deleted after
+OUTBOX_RETENTION_DAYS.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("OUTBOX_DB", os.path.join("config", "outbox.db"))
+WORKERS = int(os.getenv("OUTBOX_WORKERS", "3"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = 60  # seconds; doubles per failed attempt
+BACKOFF_CAP = 3600
+# a running job whose worker hasn't finished it in this long is reclaimed
+LEASE = 900
+# a failed job's key is only accepted again by enqueue after this long
+REQUEUE_AFTER = float(os.getenv("OUTBOX_REQUEUE_HOURS", "24")) * 3600
+# done/failed jobs older than this are deleted (0 = keep forever)
+RETENTION_DAYS = float(os.getenv("OUTBOX_RETENTION_DAYS", "30"))
+
+DONE = "done"
+
+_local = threading.local()
+_handlers = {}  # kind -> [(stage, fn)]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT NOT NULL DEFAULT '{}',
+    stage TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_at REAL NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, next_at);
+"""
+
+
+class PermanentError(Exception):
+    """A stage failure that retrying won't fix."""
+
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def _transaction():
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def register(kind, stages):
+    """Set the ordered [(stage name, fn)] pipeline for a job kind."""
+    _handlers[kind] = list(stages)
+
+
+def enqueue(kind, key, payload):
+    """Queue a job -> True if it was queued or a failed one re-queued.
+
+    A job with this key that failed more than REQUEUE_AFTER ago resumes from
+    the stage it failed at, keeping its attempts (so it gets one more try);
+    False if the key is pending, running, done or failed more recently.
+    """
+    first_stage = _handlers[kind][0][0]
+    now = time.time()
+    cur = _connect().execute(
+        "INSERT INTO jobs (kind, key, payload, stage, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (kind, key) DO UPDATE SET state = 'pending', next_at = 0, "
+        "payload = excluded.payload, updated_at = excluded.updated_at "
+        "WHERE jobs.state = 'failed' AND jobs.updated_at < ?",
+        (kind, key, json.dumps(payload), first_stage, now, now, now - REQUEUE_AFTER),
+    )
+    return cur.rowcount == 1
+
+
+def requeue(job_id):
+    """Put a failed job back in line now with fresh attempts -> True if it was failed."""
+    cur = _connect().execute(
+        "UPDATE jobs SET state = 'pending', attempts = 0, next_at = 0, updated_at = ? "
+        "WHERE id = ? AND state = 'failed'",
+        (time.time(), job_id),
+    )
+    return cur.rowcount == 1
+
+
+def prune(days=None):
+    """Delete done and failed jobs last updated more than ``days`` ago -> rows deleted."""
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return 0
+    cur = _connect().execute(
+        "DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?",
+        (time.time() - days * 86400,),
+    )
+    return cur.rowcount
+
+
+def _claim(kinds):
+    now = time.time()
+    marks = ",".join("?" * len(kinds))
+    with _transaction() as conn:
+        row = conn.execute(
+            f"SELECT * FROM jobs WHERE kind IN ({marks}) AND "
+            "((state = 'pending' AND next_at <= ?) OR (state = 'running' AND lease_until < ?)) "
+            "ORDER BY next_at, id LIMIT 1",
+            (*kinds, now, now),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE jobs SET state = 'running', lease_until = ?, updated_at = ? WHERE id = ?",
+            (now + LEASE, now, row['id']),
+        )
+    return dict(row)
+
+
+def _save(job_id, **fields):
+    fields['updated_at'] = time.time()
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    _connect().execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _backoff(attempts):
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+def run_job(job):
+    """Run a claimed job from its current stage -> final state."""
+    stages = _handlers[job['kind']]
+    names = [name for name, _ in stages]
+    payload = json.loads(job['payload'])
+    result = json.loads(job['result'])
+    attempts = job['attempts']
+    for name, fn in stages[names.index(job['stage']):]:
+        try:
+            result.update(fn(payload, result) or {})
+        except Exception as e:
+            attempts += 1
+            error = f"{name}: {type(e).__name__}: {e}"
+            if isinstance(e, PermanentError) or attempts >= MAX_ATTEMPTS:
+                logger.error(f"outbox job {job['kind']}/{job['id']} failed: {error}")
+                _save(job['id'], stage=name, state='failed', attempts=attempts, error=error,
+                      result=json.dumps(result))
+                return 'failed'
+            delay = _backoff(attempts)
+            logger.warning(f"outbox job {job['kind']}/{job['id']} {error}; retrying in {delay:.0f}s")
+            _save(job['id'], stage=name, state='pending', attempts=attempts, error=error,
+                  next_at=time.time() + delay, result=json.dumps(result))
+            return 'retry'
+        # progress is durable per stage; a later failure resumes after this one
+        attempts = 0
+        following = names.index(name) + 1
+        _save(job['id'], stage=names[following] if following < len(names) else DONE,
+              attempts=0, error=None, result=json.dumps(result))
+    _save(job['id'], stage=DONE, state=DONE)
+    return DONE
+
+
+def _worker(kinds, counts, lock):
+    while True:
+        job = _claim(kinds)
+        if job is None:
+            return
+        try:
+            outcome = run_job(job)
+        except Exception as e:
+            # bookkeeping itself failed; the lease lets a later drain retry it
+            logger.error(f"outbox job {job['kind']}/{job['id']} crashed: {e}")
+            outcome = 'retry'
+        with lock:
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+
+def drain(kinds, workers=None):
+    """Run every job that is ready now with a pool of workers -> outcome counts.
+
+    Jobs waiting out a retry backoff are left for a later drain. Expired
+    finished jobs are pruned first.
+    """
+    try:
+        pruned = prune()
+        if pruned:
+            logger.info(f"outbox pruned {pruned} finished jobs")
+    except sqlite3.Error as e:
+        logger.warning(f"outbox prune failed: {e}")
+    counts = {}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=_worker, args=(list(kinds), counts, lock), daemon=True)
+        for _ in range(max(1, workers or WORKERS))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def stats(kind=None):
+    """{state: count} for one kind, or all jobs."""
+    if kind:
+        rows = _connect().execute(
+            "SELECT state, COUNT(*) AS n FROM jobs WHERE kind = ? GROUP BY state", (kind,)
+        )
+    else:
+        rows = _connect().execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state")
+    return {r['state']: r['n'] for r in rows}
+
+
+def recent(kind=None, limit=50):
+    """Latest jobs (newest first) without their payloads."""
+    query = "SELECT id, kind, key, stage, state, attempts, next_at, error, updated_at FROM jobs"
+    params = ()
+    if kind:
+        query += " WHERE kind = ?"
+        params = (kind,)
+    rows = _connect().execute(query + " ORDER BY id DESC LIMIT ?", (*params, limit))
+    return [dict(r) for r in rows]
@@ -0,0 +1,179 @@
+"""Process-wide pacing of Graph publish calls, driven by Graph's usage headers.
+
+Every Graph response passes through ``observe``, which records the
+percentages reported in ``X-App-Usage``, ``X-Page-Usage`` and
+``X-Business-Use-Case-Usage`` (plus any "estimated time to regain access").
+Publish calls (FB photo uploads, IG publishes) take a token from a bucket
+whose refill rate shrinks as usage climbs and stops altogether near the
+limit, so the campaign threads, the Instagram sync and the Grahak scripts
+slow down together instead of running into throttling errors.
+
+Non-urgent producers (e.g. the news feed run) check ``should_defer`` and
+leave remaining work for their next run while usage is high. Instagram's
+own 24h content-publishing quota is tracked per IG account.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_PER_MINUTE = float(os.getenv("GRAPH_PUBLISH_PER_MINUTE", "6"))
+BURST = int(os.getenv("GRAPH_PUBLISH_BURST", "3"))
+
+# usage percentages (highest of call count / CPU time / total time)
+SLOW_AT = 50  # start slowing down
+DEFER_AT = 75  # non-urgent work waits for the next run
+STOP_AT = 95  # no publishes until usage drops or access is regained
+MIN_FACTOR = 0.1  # slowest pace just below STOP_AT, as a fraction of the full rate
+# a reading this old no longer says much about the rolling window
+USAGE_TTL = 300
+# keep this many IG publishes per 24h in reserve
+IG_QUOTA_RESERVE = int(os.getenv("IG_QUOTA_RESERVE", "2"))
+IG_QUOTA_TTL = 600
+# longest single wait in acquire while watching a caller's stop event
+STOP_CHECK = 1.0
+
+_cond = threading.Condition()
+_usage = {}  # header source -> (percent, observed at)
+_blocked_until = 0.0
+_tokens = float(BURST)
+_refilled_at = time.time()
+_ig_quota = {}  # ig user id -> {'used', 'total', 'checked_at'}
+
+
+def _percent(usage: dict) -> float:
+    return max(
+        float(usage.get(key) or 0) for key in ("call_count", "total_cputime", "total_time")
+    )
+
+
+def observe(headers) -> None:
+    """Record the usage headers of a Graph response."""
+    global _blocked_until
+    now = time.time()
+    readings = {}
+    regain = 0
+    for header in ("X-App-Usage", "X-Page-Usage"):
+        raw = headers.get(header)
+        if raw:
+            try:
+                readings[header] = _percent(json.loads(raw))
+            except (ValueError, TypeError, AttributeError):
+                pass
+    raw = headers.get("X-Business-Use-Case-Usage")
+    if raw:
+        try:
+            for business_id, entries in json.loads(raw).items():
+                for entry in entries:
+                    readings[f"buc:{business_id}:{entry.get('type')}"] = _percent(entry)
+                    regain = max(regain, float(entry.get("estimated_time_to_regain_access") or 0))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    if not readings:
+        return
+    with _cond:
+        for source, percent in readings.items():
+            _usage[source] = (percent, now)
+        if regain:
+            # minutes until Graph lets this business use case back in
+            _blocked_until = max(_blocked_until, now + regain * 60)
+        _cond.notify_all()
+
+
+def usage() -> float:
+    """Highest recent usage percentage across all observed quotas."""
+    now = time.time()
+    return max((p for p, at in _usage.values() if now - at < USAGE_TTL), default=0.0)
+
+
+def _factor(percent: float) -> float:
+    if percent < SLOW_AT:
+        return 1.0
+    if percent >= STOP_AT:
+        return 0.0
+    return 1.0 - (1.0 - MIN_FACTOR) * (percent - SLOW_AT) / (STOP_AT - SLOW_AT)
+
+
+def should_defer() -> bool:
+    """True while non-urgent publishing should wait for a later run."""
+    return time.time() < _blocked_until or usage() >= DEFER_AT
+
+
+def _wait_needed(now: float) -> float:
+    """Seconds until a token is available (0 = took one)."""
+    global _tokens, _refilled_at
+    if now < _blocked_until:
+        return _blocked_until - now
+    rate = PUBLISH_PER_MINUTE / 60 * _factor(usage())
+    _tokens = min(BURST, _tokens + (now - _refilled_at) * rate)
+    _refilled_at = now
+    if _tokens >= 1:
+        _tokens -= 1
+        return 0.0
+    if rate == 0:
+        # stopped: re-check once the current readings have aged out
+        return USAGE_TTL / 10
+    return (1 - _tokens) / rate
+
+
+def acquire(timeout: float | None = None, stop_event: threading.Event | None = None) -> bool:
+    """Block until a publish may go out.
+
+    False if that takes longer than ``timeout`` or ``stop_event`` (a posting
+    loop's stop flag) is set while waiting; it is checked every STOP_CHECK
+    seconds, so stopping a task never waits out a throttle.
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    with _cond:
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            now = time.time()
+            wait = _wait_needed(now)
+            if wait == 0:
+                return True
+            if deadline is not None and now + wait > deadline:
+                return False
+            if wait > 5:
+                logger.info(f"rate governor: usage {usage():.0f}%, next publish in {wait:.0f}s")
+            if stop_event is not None:
+                wait = min(wait, STOP_CHECK)
+            # woken early if new usage headers arrive
+            _cond.wait(wait)
+
+
+def record_ig_quota(ig_user_id: str, used: int, total: int) -> None:
+    with _cond:
+        _ig_quota[ig_user_id] = {"used": used, "total": total, "checked_at": time.time()}
+
+
+def ig_quota_stale(ig_user_id: str) -> bool:
+    quota = _ig_quota.get(ig_user_id)
+    return quota is None or time.time() - quota["checked_at"] > IG_QUOTA_TTL
+
+
+def ig_allowed(ig_user_id: str) -> bool:
+    """False once the account is within IG_QUOTA_RESERVE of its 24h limit."""
+    quota = _ig_quota.get(ig_user_id)
+    return quota is None or quota["used"] < quota["total"] - IG_QUOTA_RESERVE
+
+
+def ig_published(ig_user_id: str) -> None:
+    with _cond:
+        if ig_user_id in _ig_quota:
+            _ig_quota[ig_user_id]["used"] += 1
+
+
+def snapshot() -> dict:
+    """Current governor state (for logs / debugging)."""
+    with _cond:
+        return {
+            "usage": usage(),
+            "blocked_until": _blocked_until,
+            "tokens": _tokens,
+            "ig_quota": {k: dict(v) for k, v in _ig_quota.items()},
+        }
@@ -0,0 +1,99 @@
+"""Render a batch of cards in parallel across worker processes.
+
+Rendering is CPU-bound Pillow work, so a run's new items are rendered on a
+``ProcessPoolExecutor`` (RENDER_WORKERS processes) instead of one at a time
+between network calls. Each worker compiles the templates and builds their
+static layers and fonts once when it starts. ``batch`` hands back one Future
+per card as soon as it is submitted, so publishing can start on the first
+finished card while the rest are still rendering.
+
+Workers are spawned, so each one re-imports the launching script as
+``__mp_main__``: a script using the pool must keep its side effects (.env,
+log files, dedup stores, outbox registration) behind
+``if __name__ == "__main__"`` or inside functions, as the Grahak scripts do.
+
+Cards are encoded bytes (one per encoding profile) and never touch the
+disk: ``keep`` holds a job's card in memory until it is uploaded
+(``forget``), and a job whose card isn't there (e.g. after a restart)
+renders it again.
+
+Usage:
+    with render_pool.batch([(key, "grahak_news", {"title": t, "source": s})], ["fb_feed"]) as rendered:
+        jpeg = rendered[key].result()["fb_feed"]
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import card_templates
+import encoding_profiles
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# below this many cards, starting processes costs more than it saves
+MIN_BATCH = 2
+# rendered cards kept in memory awaiting upload (~200 KB each)
+CACHE_SIZE = 64
+
+_cards_lock = threading.Lock()
+_cards = OrderedDict()  # job key -> JPEG bytes, oldest first
+
+
+def _warm(templates):
+    for name in templates:
+        try:
+            card_templates.warm(name)
+        except Exception as e:
+            logger.warning(f"could not warm card template {name}: {e}")
+
+
+def _render(name, values, profiles):
+    return card_templates.render_encoded(name, profiles, **values)
+
+
+@contextmanager
+def batch(cards, profiles=(encoding_profiles.DEFAULT,), workers=None):
+    """Render [(key, template, values)] in parallel -> {key: Future of {profile: bytes}}.
+
+    Yields {} for batches too small to be worth a pool (callers then render
+    inline). Leaving the block cancels cards nobody waited for.
+    """
+    workers = min(workers or WORKERS, len(cards))
+    if len(cards) < MIN_BATCH or workers < 2:
+        yield {}
+        return
+    templates = sorted({name for _, name, _ in cards})
+    # spawn, not fork: the scripts already run background threads (dedup
+    # compaction, page directory refresh) whose locks fork could copy held
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_warm, initargs=(templates,))
+    try:
+        yield {key: pool.submit(_render, name, values, tuple(profiles)) for key, name, values in cards}
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def keep(key, data):
+    """Hold a job's rendered card until ``forget``; the oldest go past CACHE_SIZE."""
+    with _cards_lock:
+        _cards[key] = data
+        _cards.move_to_end(key)
+        while len(_cards) > CACHE_SIZE:
+            _cards.popitem(last=False)
+
+
+def cached(key):
+    """A job's rendered card, or None if it has to be rendered again."""
+    with _cards_lock:
+        return _cards.get(key)
+
+
+def forget(key):
+    with _cards_lock:
+        _cards.pop(key, None)
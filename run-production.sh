@@ -2,10 +2,12 @@
 
 # PostPilot Flask App - Production Run Script
 # This script runs the app using Gunicorn (production WSGI server)
-# Usage: ./run-production.sh [workers] [port]
+# Usage: ./run-production.sh [workers] [port] [threads]
 
 WORKERS=${1:-4}
 PORT=${2:-5000}
+# threads per worker; each open dashboard holds one for its /api/stream
+THREADS=${3:-16}
 
 echo "🚀 PostPilot Flask (Production Mode)"
 echo "===================================="
@@ -13,6 +15,7 @@ echo ""
 echo "Configuration:"
 echo "  Workers: $WORKERS"
 echo "  Port: $PORT"
+echo "  Threads per worker: $THREADS"
 echo ""
 
 # Install production requirements
@@ -22,7 +25,8 @@ pip install -r requirements.txt -q
 echo "Starting server with $WORKERS workers..."
 gunicorn \
     --workers $WORKERS \
-    --worker-class sync \
+    --worker-class gthread \
+    --threads $THREADS \
     --bind 0.0.0.0:$PORT \
     --timeout 120 \
     --access-logfile - \
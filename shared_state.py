@@ -0,0 +1,184 @@
+"""Runtime task state shared by every gunicorn worker (SQLite, WAL mode).
+
+Each posting task (tour, nz, insta) has one row holding its running flag,
+status text, current post, interval and the pid of the worker that owns
+the posting thread. Starting a task is an atomic claim on that row, so only
+one worker ever runs a given loop; the owner refreshes a heartbeat, and a
+row whose owner stopped heartbeating can be claimed again.
+
+State changes are also appended to a small ``events`` table that the
+/api/stream endpoint in every worker follows, so a change made in one worker
+(or in a Grahak script subprocess) reaches every connected dashboard.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.getenv("STATE_DB", os.path.join("config", "runtime_state.db"))
+
+# task name -> default interval in seconds
+TASKS = {
+    'tour': 30 * 60,  # 30 minutes
+    'nz': 30 * 60,
+    'insta': 3 * 60,  # 3 minutes for Instagram sync
+}
+
+# an owner that hasn't heartbeated for this long is considered dead
+HEARTBEAT_TIMEOUT = 30
+# how many events to keep for followers that fall behind
+EVENT_BACKLOG = 1000
+
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    name TEXT PRIMARY KEY,
+    running INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT '',
+    current_post TEXT,
+    interval INTEGER NOT NULL,
+    owner_pid INTEGER,
+    heartbeat REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.executemany(
+            "INSERT OR IGNORE INTO tasks (name, interval) VALUES (?, ?)", TASKS.items()
+        )
+        _local.conn = conn
+    return conn
+
+
+def publish(kind, data=None):
+    """Append an event for /api/stream followers."""
+    conn = _connect()
+    cur = conn.execute(
+        "INSERT INTO events (kind, data, ts) VALUES (?, ?, ?)",
+        (kind, json.dumps(data), time.time()),
+    )
+    if cur.lastrowid % 100 == 0:
+        conn.execute("DELETE FROM events WHERE seq <= ?", (cur.lastrowid - EVENT_BACKLOG,))
+    return cur.lastrowid
+
+
+def last_event_seq():
+    row = _connect().execute("SELECT MAX(seq) AS seq FROM events").fetchone()
+    return row['seq'] or 0
+
+
+def events_since(seq):
+    """[(seq, kind, data)] published after seq, oldest first."""
+    rows = _connect().execute(
+        "SELECT seq, kind, data FROM events WHERE seq > ? ORDER BY seq", (seq,)
+    )
+    return [(r['seq'], r['kind'], json.loads(r['data'])) for r in rows]
+
+
+def get_all():
+    """{task: row dict} for every task, in one read."""
+    rows = _connect().execute("SELECT * FROM tasks")
+    return {r['name']: dict(r) for r in rows}
+
+
+def get(task):
+    row = _connect().execute("SELECT * FROM tasks WHERE name = ?", (task,)).fetchone()
+    return dict(row) if row else None
+
+
+def claim(task, pid=None):
+    """Mark task running and owned by this process; False if someone else owns it."""
+    pid = pid or os.getpid()
+    now = time.time()
+    cur = _connect().execute(
+        "UPDATE tasks SET running = 1, owner_pid = ?, heartbeat = ?, status = 'Starting...', current_post = NULL "
+        "WHERE name = ? AND (running = 0 OR heartbeat < ?)",
+        (pid, now, task, now - HEARTBEAT_TIMEOUT),
+    )
+    if cur.rowcount == 1:
+        publish('status', {'task': task})
+    return cur.rowcount == 1
+
+
+def release(task):
+    """Mark task stopped; returns False if it was not running."""
+    cur = _connect().execute(
+        "UPDATE tasks SET running = 0, status = '', current_post = NULL WHERE name = ? AND running = 1",
+        (task,),
+    )
+    if cur.rowcount == 1:
+        publish('status', {'task': task})
+    return cur.rowcount == 1
+
+
+def update_status(task, is_running, message='', current_post=None):
+    """Record a status update from a posting loop.
+
+    A loop reporting ``is_running=True`` after the task was released (e.g.
+    its last 'Posted' callback racing a stop) does not flip it back on.
+    """
+    _connect().execute(
+        "UPDATE tasks SET status = ?, current_post = ?, running = ? "
+        "WHERE name = ? AND (running = 1 OR ? = 0)",
+        (message, current_post, int(is_running), task, int(is_running)),
+    )
+    publish('status', {'task': task})
+
+
+def set_interval(task, interval):
+    _connect().execute("UPDATE tasks SET interval = ? WHERE name = ?", (interval, task))
+    publish('status', {'task': task})
+
+
+def release_stale(timeout=HEARTBEAT_TIMEOUT):
+    """Stop tasks whose owner stopped heartbeating -> their names.
+
+    Publishes a 'stopped' event for each, so dashboards learn a worker died
+    instead of showing the task as running until someone starts it again.
+    """
+    conn = _connect()
+    cutoff = time.time() - timeout
+    stale = [r['name'] for r in conn.execute(
+        "SELECT name FROM tasks WHERE running = 1 AND heartbeat < ?", (cutoff,)
+    )]
+    released = []
+    for task in stale:
+        cur = conn.execute(
+            "UPDATE tasks SET running = 0, status = 'Stopped (worker lost)', current_post = NULL "
+            "WHERE name = ? AND running = 1 AND heartbeat < ?",
+            (task, cutoff),
+        )
+        if cur.rowcount == 1:
+            publish('stopped', {'task': task})
+            released.append(task)
+    return released
+
+
+def heartbeat(tasks, pid=None):
+    """Refresh the heartbeat of the given tasks owned by this process."""
+    if not tasks:
+        return
+    pid = pid or os.getpid()
+    marks = ",".join("?" * len(tasks))
+    _connect().execute(
+        f"UPDATE tasks SET heartbeat = ? WHERE owner_pid = ? AND running = 1 AND name IN ({marks})",
+        (time.time(), pid, *tasks),
+    )
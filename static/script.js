@@ -1,7 +1,12 @@
 // Global state
 let currentPostType = null;
-let currentPostIndex = null;
+let currentPostId = null;
 let existingImages = [];
+let loadedPosts = {};  // postType -> {id: post} for the pages shown
+const POSTS_PAGE_SIZE = 50;
+const THUMB_WIDTH = 320;  // pre-derived on upload (image_store.THUMB_WIDTH)
+// originals and upload-size variants need a signed URL once IMAGE_URL_SECRET is set
+const PREVIEW_WIDTH = 1440;
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function() {
@@ -11,7 +16,7 @@ document.addEventListener('DOMContentLoaded', function() {
     loadAllPosts();
     loadIntervals();
     updateStatus();
-    setInterval(updateStatus, 3000);
+    startEventStream();
 });
 
 // Tab functionality
@@ -83,22 +88,43 @@ function loadAllPosts() {
     loadPosts('insta');
 }
 
-function loadPosts(postType) {
-    fetch(`/api/posts/${postType}`)
-        .then(response => response.json())
-        .then(posts => {
+function loadPosts(postType, cursor = null) {
+    // one page at a time; the browser revalidates with If-None-Match and
+    // reuses its cached copy when the server answers 304
+    let url = `/api/posts/${postType}?limit=${POSTS_PAGE_SIZE}`;
+    if (cursor !== null) url += `&cursor=${cursor}`;
+    fetch(url)
+        .then(response => response.json().then(posts => ({
+            posts, nextCursor: response.headers.get('X-Next-Cursor')
+        })))
+        .then(({ posts, nextCursor }) => {
             const container = document.getElementById(`${postType}PostsList`);
-            container.innerHTML = '';
+            if (cursor === null) {
+                container.innerHTML = '';
+                loadedPosts[postType] = {};
+            } else {
+                const more = container.querySelector('.load-more');
+                if (more) more.remove();
+            }
             
-            if (posts.length === 0) {
+            if (cursor === null && posts.length === 0) {
                 container.innerHTML = '<p class="loading">No posts yet. Add one to get started!</p>';
                 return;
             }
             
-            posts.forEach((post, index) => {
-                const card = createPostCard(postType, post, index);
+            posts.forEach(post => {
+                loadedPosts[postType][post.id] = post;
+                const card = createPostCard(postType, post);
                 container.appendChild(card);
             });
+            
+            if (nextCursor) {
+                const more = document.createElement('button');
+                more.className = 'btn btn-secondary btn-small load-more';
+                more.textContent = 'Load more';
+                more.addEventListener('click', () => loadPosts(postType, nextCursor));
+                container.appendChild(more);
+            }
         })
         .catch(error => {
             console.error('Error loading posts:', error);
@@ -106,12 +132,12 @@ function loadPosts(postType) {
         });
 }
 
-function createPostCard(postType, post, index) {
+function createPostCard(postType, post) {
     const card = document.createElement('div');
     card.className = 'post-card';
     
     const imageElem = post.image_filename ? 
-        `<img src="/images/${post.image_filename}" alt="Post" class="post-image" onerror="this.src='data:image/svg+xml,%3Csvg xmlns=%22http://www.w3.org/2000/svg%22 width=%22300%22 height=%22200%22%3E%3Crect fill=%22%23ddd%22 width=%22300%22 height=%22200%22/%3E%3Ctext x=%2250%25%22 y=%2250%25%22 text-anchor=%22middle%22 fill=%22%23999%22%3ENo Image%3C/text%3E%3C/svg%3E'"></img>` :
+        `<img src="/images/${post.image_filename}?w=${THUMB_WIDTH}" alt="Post" class="post-image" loading="lazy" onerror="this.src='data:image/svg+xml,%3Csvg xmlns=%22http://www.w3.org/2000/svg%22 width=%22300%22 height=%22200%22%3E%3Crect fill=%22%23ddd%22 width=%22300%22 height=%22200%22/%3E%3Ctext x=%2250%25%22 y=%2250%25%22 text-anchor=%22middle%22 fill=%22%23999%22%3ENo Image%3C/text%3E%3C/svg%3E'"></img>` :
         `<div class="post-image" style="display: flex; align-items: center; justify-content: center; background: #ddd;">No Image</div>`;
     
     card.innerHTML = `
@@ -119,44 +145,33 @@ function createPostCard(postType, post, index) {
         <div class="post-message">${escapeHtml(post.message)}</div>
         ${post.image_filename ? `<div class="post-image-name">📁 ${escapeHtml(post.image_filename)}</div>` : ''}
         <div class="post-actions">
-            <button class="btn btn-info btn-small" onclick="editPost('${postType}', ${index})">✏️ Edit</button>
-            <button class="btn btn-danger btn-small" onclick="deletePost('${postType}', ${index})">❌ Delete</button>
+            <button class="btn btn-info btn-small" onclick="editPost('${postType}', ${post.id})">✏️ Edit</button>
+            <button class="btn btn-danger btn-small" onclick="deletePost('${postType}', ${post.id})">❌ Delete</button>
         </div>
     `;
     
     return card;
 }
 
-function editPost(postType, index) {
-    const posts = document.getElementById(`${postType}PostsList`);
-    // Fetch fresh data to get the actual post
-    fetch(`/api/posts/${postType}`)
-        .then(response => response.json())
-        .then(allPosts => {
-            if (index < allPosts.length) {
-                const post = allPosts[index];
-                currentPostType = postType;
-                currentPostIndex = index;
-                document.getElementById('postMessage').value = post.message;
-                document.getElementById('existingImage').value = post.image_filename || '';
-                
-                if (post.image_filename) {
-                    const preview = document.getElementById('imagePreview');
-                    preview.src = `/images/${post.image_filename}`;
-                    preview.style.display = 'block';
-                } else {
-                    document.getElementById('imagePreview').style.display = 'none';
-                }
-                
-                document.getElementById('postImage').value = '';
-                openAddPostModal(postType);
-            }
-        });
+function editPost(postType, postId) {
+    const post = (loadedPosts[postType] || {})[postId];
+    if (!post) return;
+    // open first: openAddPostModal resets the form fields
+    openAddPostModal(postType);
+    currentPostId = postId;
+    document.getElementById('postMessage').value = post.message;
+    document.getElementById('existingImage').value = post.image_filename || '';
+    
+    if (post.image_filename) {
+        const preview = document.getElementById('imagePreview');
+        preview.src = `/images/${post.image_filename}?w=${PREVIEW_WIDTH}`;
+        preview.style.display = 'block';
+    }
 }
 
-function deletePost(postType, index) {
+function deletePost(postType, postId) {
     if (confirm('Are you sure you want to delete this post?')) {
-        fetch(`/api/posts/${postType}/${index}`, {
+        fetch(`/api/posts/${postType}/${postId}`, {
             method: 'DELETE'
         })
         .then(response => response.json())
@@ -174,7 +189,7 @@ function deletePost(postType, index) {
 // Modal functions
 function openAddPostModal(postType) {
     currentPostType = postType;
-    currentPostIndex = null;
+    currentPostId = null;
     document.getElementById('postMessage').value = '';
     document.getElementById('existingImage').value = '';
     document.getElementById('postImage').value = '';
@@ -185,7 +200,7 @@ function openAddPostModal(postType) {
 function closeAddPostModal() {
     document.getElementById('postModal').classList.remove('active');
     currentPostType = null;
-    currentPostIndex = null;
+    currentPostId = null;
 }
 
 // Form submission
@@ -232,10 +247,12 @@ function savePost(message, imageFilename) {
         image_filename: imageFilename
     };
     
-    const method = currentPostIndex !== null ? 'PUT' : 'POST';
-    const url = currentPostIndex !== null ? 
-        `/api/posts/${currentPostType}/${currentPostIndex}` :
-        `/api/posts/${currentPostType}`;
+    const postType = currentPostType;
+    const isEdit = currentPostId !== null;
+    const method = isEdit ? 'PUT' : 'POST';
+    const url = isEdit ? 
+        `/api/posts/${postType}/${currentPostId}` :
+        `/api/posts/${postType}`;
     
     fetch(url, {
         method: method,
@@ -247,8 +264,8 @@ function savePost(message, imageFilename) {
     .then(response => response.json())
     .then(data => {
         closeAddPostModal();
-        loadPosts(currentPostType);
-        showSuccess(`Post ${currentPostIndex !== null ? 'updated' : 'added'} successfully!`);
+        loadPosts(postType);
+        showSuccess(`Post ${isEdit ? 'updated' : 'added'} successfully!`);
     })
     .catch(error => {
         console.error('Error saving post:', error);
@@ -275,7 +292,7 @@ function selectExistingImage(e) {
     const filename = e.target.value;
     if (filename) {
         const preview = document.getElementById('imagePreview');
-        preview.src = `/images/${filename}`;
+        preview.src = `/images/${filename}?w=${PREVIEW_WIDTH}`;
         preview.style.display = 'block';
         document.getElementById('postImage').value = '';
     } else {
@@ -312,16 +329,19 @@ function stopPosting(postType) {
 function loadGrahakStatus() {
     fetch('/api/grahak/status')
         .then(r=>r.json())
-        .then(s=>{
-            document.getElementById('newsStatus').textContent = s.news_enabled ? 'ON' : 'OFF';
-            document.getElementById('newsStatus').className = 'badge ' + (s.news_enabled ? 'ON' : 'OFF');
-            document.getElementById('ytStatus').textContent = s.youtube_enabled ? 'ON' : 'OFF';
-            document.getElementById('ytStatus').className = 'badge ' + (s.youtube_enabled ? 'ON' : 'OFF');
-            document.getElementById('lastNewsRun').textContent = s.last_news_run || '-';
-            document.getElementById('lastYTRun').textContent = s.last_youtube_run || '-';
-            document.getElementById('lastNewsPost').textContent = s.last_news_post || '-';
-            document.getElementById('lastYTPost').textContent = s.last_youtube_post || '-';
-        }).catch(e=>console.error(e));
+        .then(renderGrahakStatus)
+        .catch(e=>console.error(e));
+}
+
+function renderGrahakStatus(s) {
+    document.getElementById('newsStatus').textContent = s.news_enabled ? 'ON' : 'OFF';
+    document.getElementById('newsStatus').className = 'badge ' + (s.news_enabled ? 'ON' : 'OFF');
+    document.getElementById('ytStatus').textContent = s.youtube_enabled ? 'ON' : 'OFF';
+    document.getElementById('ytStatus').className = 'badge ' + (s.youtube_enabled ? 'ON' : 'OFF');
+    document.getElementById('lastNewsRun').textContent = s.last_news_run || '-';
+    document.getElementById('lastYTRun').textContent = s.last_youtube_run || '-';
+    document.getElementById('lastNewsPost').textContent = s.last_news_post || '-';
+    document.getElementById('lastYTPost').textContent = s.last_youtube_post || '-';
 }
 
 function startNews() {fetch('/api/grahak/start_news',{method:'POST'}).then(loadGrahakStatus).catch(e=>{});}
@@ -366,6 +386,14 @@ function loadLogs() {
         });
 }
 
+const LOG_LINES_SHOWN = 50;
+
+function appendLogLines(boxId, lines) {
+    const box = document.getElementById(boxId);
+    const current = box.textContent ? box.textContent.split('\n') : [];
+    box.textContent = current.concat(lines).slice(-LOG_LINES_SHOWN).join('\n');
+}
+
 // new tab buttons listeners
 function initializeGrahakButtons(){
     document.getElementById('startNewsBtn').addEventListener('click', startNews);
@@ -383,12 +411,13 @@ initializeButtons = function(){
     initializeGrahakButtons();
 };
 
-// call status and feeds/logs periodically when grahak active
-setInterval(()=>{
-    if(document.querySelector(`[data-tab="grahak"]`).classList.contains('active')){
+// load the newsroom once when its tab is opened; status and log lines
+// then arrive through the event stream
+document.addEventListener('click', event => {
+    if (event.target.closest('[data-tab="grahak"]')) {
         loadGrahakStatus();loadFeeds();loadLogs();
     }
-},5000);
+});
 
 function startAllPosting() {
     fetch('/api/control/all/start', {
@@ -424,33 +453,57 @@ function stopAllPosting() {
 function updateStatus() {
     fetch('/api/status')
         .then(response => response.json())
-        .then(status => {
-            updateButtonState('Tour', status.tour_running);
-            updateButtonState('NZ', status.nz_running);
-            updateButtonState('Insta', status.insta_running);
-            
-            // Build status messages
-            let statusMessages = [];
-            if (status.tour_running) {
-                statusMessages.push(`📍 Tour: ${status.tour_status || 'Running'} ${status.tour_current_post ? ' - ' + status.tour_current_post : ''}`);
-            }
-            if (status.nz_running) {
-                statusMessages.push(`📍 NZ: ${status.nz_status || 'Running'} ${status.nz_current_post ? ' - ' + status.nz_current_post : ''}`);
-            }
-            if (status.insta_running) {
-                statusMessages.push(`📍 Insta: ${status.insta_status || 'Running'} ${status.insta_current_post ? ' - ' + status.insta_current_post : ''}`);
-            }
-            
-            const globalElement = document.getElementById('globalStatus');
-            if (statusMessages.length > 0) {
-                globalElement.innerHTML = `🟢 ${statusMessages.join(' | ')}`;
-            } else {
-                globalElement.textContent = '🔴 All Stopped';
-            }
-        })
+        .then(renderStatus)
         .catch(error => console.error('Error updating status:', error));
 }
 
+function renderStatus(status) {
+    updateButtonState('Tour', status.tour_running);
+    updateButtonState('NZ', status.nz_running);
+    updateButtonState('Insta', status.insta_running);
+    
+    // Build status messages
+    let statusMessages = [];
+    if (status.tour_running) {
+        statusMessages.push(`📍 Tour: ${status.tour_status || 'Running'} ${status.tour_current_post ? ' - ' + status.tour_current_post : ''}`);
+    }
+    if (status.nz_running) {
+        statusMessages.push(`📍 NZ: ${status.nz_status || 'Running'} ${status.nz_current_post ? ' - ' + status.nz_current_post : ''}`);
+    }
+    if (status.insta_running) {
+        statusMessages.push(`📍 Insta: ${status.insta_status || 'Running'} ${status.insta_current_post ? ' - ' + status.insta_current_post : ''}`);
+    }
+    
+    const globalElement = document.getElementById('globalStatus');
+    if (statusMessages.length > 0) {
+        globalElement.innerHTML = `🟢 ${statusMessages.join(' | ')}`;
+    } else {
+        globalElement.textContent = '🔴 All Stopped';
+    }
+}
+
+// Push updates: one connection per tab, messages only when something changes
+function startEventStream() {
+    if (!window.EventSource) {
+        setInterval(updateStatus, 3000);
+        return;
+    }
+    const source = new EventSource('/api/stream');
+    // refused (too many open streams) or gone for good: fall back to polling
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+            setInterval(updateStatus, 3000);
+        }
+    };
+    source.addEventListener('status', e => renderStatus(JSON.parse(e.data)));
+    source.addEventListener('stopped', e => showError(`${JSON.parse(e.data).task} stopped: its worker is gone`));
+    source.addEventListener('grahak', e => renderGrahakStatus(JSON.parse(e.data)));
+    source.addEventListener('log', e => {
+        const data = JSON.parse(e.data);
+        appendLogLines(data.source === 'news' ? 'newsLogBox' : 'ytLogBox', data.lines);
+    });
+}
+
 // Load and display current intervals
 function loadIntervals() {
     fetch('/api/status')
@@ -0,0 +1,80 @@
+"""Signed /images URLs handed to Instagram by the Grahak outbox."""
+
+import os
+from urllib.parse import urlsplit
+
+import pytest
+
+import app as dashboard
+import card_templates
+import grahak_news_auto as news
+import image_store
+
+ITEM = {"title": "Consumer forum orders refund for faulty phone", "source": "ANI"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "IMAGE_FOLDER", str(tmp_path))
+    monkeypatch.setattr(image_store, "VARIANT_FOLDER", str(tmp_path / "variants"))
+    monkeypatch.setenv("IG_DIRECT_URLS", "true")
+    monkeypatch.setenv("IMAGE_URL_SECRET", "test-secret")
+    monkeypatch.setenv("STATIC_BASE_URL", "https://example.test")
+    monkeypatch.setattr(news, "IG_USER_ID", "17841400000000000")
+    return dashboard.app.test_client()
+
+
+def _get(client, url):
+    parts = urlsplit(url)
+    return client.get(f"{parts.path}?{parts.query}")
+
+
+def test_instagram_fetches_the_ig_feed_encode(client, monkeypatch):
+    fetched = []
+
+    def publish(image_url):
+        fetched.append(_get(client, image_url))
+        return True
+
+    monkeypatch.setattr(news, "post_to_instagram_photo", publish)
+    result = news._render_stage(ITEM, {})
+    staged = os.path.join(image_store.IMAGE_FOLDER, result["image_filename"])
+    assert os.path.exists(staged)
+    # staged cards are served as stored, so nothing is derived from them
+    assert not os.path.exists(image_store.VARIANT_FOLDER)
+
+    result.update(news._instagram_stage(ITEM, result))
+
+    assert result["instagram"] is True
+    assert fetched[0].status_code == 200
+    expected = card_templates.render_bytes("grahak_news", "ig_feed", **ITEM)
+    assert fetched[0].data == expected
+    assert fetched[0].data != card_templates.render_bytes("grahak_news", "fb_feed", **ITEM)
+    assert not os.path.exists(staged)
+
+
+def test_tampered_signature_is_rejected(client):
+    filename, _ = image_store.ingest(card_templates.render_bytes("grahak_news", "ig_feed", **ITEM), derive=False)
+    url = news._public_image_url(filename)
+    assert _get(client, url).status_code == 200
+    assert _get(client, url[:-1] + ("0" if url[-1] != "0" else "1")).status_code == 403
+    # a width the URL wasn't signed for
+    assert _get(client, url.replace("?", "?w=1080&")).status_code == 403
+
+
+def test_graph_facing_forms_need_a_signature(client):
+    filename, _ = image_store.ingest(card_templates.render_bytes("grahak_news", "fb_feed", **ITEM))
+    assert client.get(f"/images/{filename}").status_code == 403
+    assert client.get(f"/images/{filename}?w=1080").status_code == 403
+    assert client.get(f"/images/{filename}?w=1000").status_code == 403
+    # dashboard thumbnails and previews stay public
+    assert client.get(f"/images/{filename}?w=320").status_code == 200
+    assert client.get(f"/images/{filename}?w=1440").status_code == 200
+    assert _get(client, image_store.signed_url(filename, "https://example.test")).status_code == 200
+
+
+def test_unsigned_images_are_public_without_a_secret(client, monkeypatch):
+    monkeypatch.delenv("IMAGE_URL_SECRET")
+    filename, _ = image_store.ingest(card_templates.render_bytes("grahak_news", "fb_feed", **ITEM))
+    assert client.get(f"/images/{filename}").status_code == 200
+    assert client.get(f"/images/{filename}?w=1080").status_code == 200